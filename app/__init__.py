@@ -9,6 +9,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from config import Config
+from app import database
 
 # Initialize extensions
 db = SQLAlchemy()
@@ -20,12 +21,17 @@ login_manager.login_message = 'Please log in to access this page.'
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database.engine_options(app.config)
     
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, render_as_batch=True)
     login_manager.init_app(app)
     
+    from app import analytics, cache
+    cache.init_app(app)
+    analytics.init_app(app)
+    
     # Register blueprints
     from app.auth import bp as auth_bp
     app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -33,9 +39,15 @@ def create_app(config_class=Config):
     from app.main import bp as main_bp
     app.register_blueprint(main_bp)
     
-    # Create database tables if they don't exist
+    from app.cli import bp as cli_bp
+    app.register_blueprint(cli_bp)
+    
+    # Apply the SQLite profile and time SQL statements; tables are created by
+    # migrations or `flask init-db`
+    from app import metrics
     with app.app_context():
-        db.create_all()
+        database.configure_engine(db.engine, app.config)
+        metrics.init_app(app, db.engine)
     
     return app
 
@@ -0,0 +1,321 @@
+"""
+Annotation analytics for the Ticket Annotation Tool.
+
+The annotation history is held per web worker as NumPy columns (ticket,
+annotator, verdict and time) in the order annotations were saved, and
+every report is computed from them in a few vectorized passes: agreement
+between annotators as Fleiss' kappa over all tickets with several
+annotators and Cohen's kappa per pair of annotators, each annotator's
+labels per active hour, and the tickets whose verdict flipped between
+annotations. Only an annotator's latest verdict on a ticket counts towards
+agreement.
+
+Annotations are never changed or deleted, so after the first report a
+worker only reads the annotations saved since, in chunks, and appends them
+to its columns. NumPy is imported on first use to keep it off the
+application's startup path.
+"""
+from datetime import datetime
+from itertools import chain
+from threading import Lock
+from flask import current_app
+from sqlalchemy import cast, func, select, Integer
+from app import db
+from app.models import Annotation, Ticket, User
+from app.labels import label_for
+
+# Gaps between an annotator's consecutive annotations longer than this end
+# a working session and do not count as active time
+IDLE_SECONDS = 600
+
+# Pairs of annotators reported by Cohen's kappa share at least this many tickets
+MIN_SHARED_TICKETS = 10
+
+# Flipped tickets listed, most flips first
+FLIPS_LIMIT = 50
+
+# History columns and their types
+COLUMNS = (('ticket', 'int64'), ('user', 'int64'), ('verdict', 'int8'), ('time', 'int64'))
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+def read_annotations(after_id=0, chunk_size=100000):
+    """
+    Yield the annotations following ``after_id`` as ``(ids, rows)`` arrays.
+
+    Each chunk holds up to ``chunk_size`` annotations in id order, ``rows``
+    one row of ``COLUMNS`` per annotation with the verdict as 1 for an
+    in-app issue and the time in seconds since the epoch.
+    """
+    np = _np()
+    stmt = (select(Annotation.id, Annotation.ticket_id, Annotation.user_id, cast(Annotation.is_app_issue, Integer),
+                   func.coalesce(cast(func.strftime('%s', Annotation.created_at), Integer), 0))
+            .where(Annotation.id > after_id)
+            .order_by(Annotation.id))
+    connection = db.session.connection()
+    # Fetched with the driver's cursor, as building result rows takes
+    # longer than reading them
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(str(stmt.compile(connection, compile_kwargs={'literal_binds': True})))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            # Flattened, as NumPy converts rows one value at a time otherwise
+            chunk = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 5).reshape(-1, 5)
+            yield chunk[:, 0], chunk[:, 1:]
+    finally:
+        cursor.close()
+
+
+class History:
+    """A web worker's copy of the annotation history, extended as annotations are added."""
+
+    def __init__(self):
+        self.last_id = 0
+        self._columns = None
+        self._lock = Lock()
+
+    def update(self, chunk_size=100000):
+        """
+        Read the annotations saved since the last update and return the history.
+
+        The history is a dict of equally long arrays, one per column in
+        ``COLUMNS``, in id order. Callers must not modify them.
+        """
+        np = _np()
+        with self._lock:
+            latest = db.session.execute(select(func.max(Annotation.id))).scalar() or 0
+            if self._columns is None or latest < self.last_id:
+                # First use, or the database was replaced
+                self.last_id = 0
+                self._columns = dict((name, np.empty(0, dtype=dtype)) for name, dtype in COLUMNS)
+            if latest > self.last_id:
+                chunks = []
+                for ids, rows in read_annotations(self.last_id, chunk_size):
+                    chunks.append(rows)
+                    self.last_id = int(ids[-1])
+                rows = np.concatenate(chunks)
+                # Kept as separate columns, which NumPy scans much faster
+                # than the columns of a table of rows
+                self._columns = dict((name, np.concatenate([self._columns[name], rows[:, i].astype(dtype)]))
+                                     for i, (name, dtype) in enumerate(COLUMNS))
+            return dict(self._columns)
+
+
+def init_app(app):
+    """Attach the annotation history to ``app``."""
+    app.extensions['annotation_history'] = History()
+
+
+def history():
+    """Return the annotation history of the current application."""
+    return current_app.extensions['annotation_history']
+
+
+def _sort(keys):
+    """
+    Return the non-negative ``keys`` sorted and the indices that sort them.
+
+    Equal keys keep their original order. Sorting the keys with the row
+    number folded in is several times faster than a stable argsort.
+    """
+    np = _np()
+    n = len(keys)
+    return np.divmod(np.sort(keys * n + np.arange(n)), n)
+
+
+def _starts(values):
+    """Return the index of the first row of every run of equal ``values``."""
+    np = _np()
+    if not len(values):
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.append(True, values[1:] != values[:-1]))
+
+
+def _dense(user):
+    """Return the distinct user ids and the index of every row's user among them."""
+    np = _np()
+    user_ids = np.flatnonzero(np.bincount(user)) if len(user) else np.empty(0, dtype=np.int64)
+    index = np.zeros(user_ids[-1] + 1 if len(user_ids) else 0, dtype=np.int64)
+    index[user_ids] = np.arange(len(user_ids))
+    return user_ids, index[user]
+
+
+def _kappa(observed, expected):
+    return None if expected >= 1 else float((observed - expected) / (1 - expected))
+
+
+def agreement(history, min_shared=MIN_SHARED_TICKETS):
+    """
+    Measure how often annotators agree on the tickets they both labeled.
+
+    Returns a dict with the number of ``tickets`` labeled by two or more
+    annotators, their observed ``agreement``, ``fleiss_kappa``,
+    ``cohen_kappa``, the mean of the pairwise kappas weighted by the
+    tickets each pair shares, and ``pairs``, one dict per pair of annotators
+    sharing at least ``min_shared`` tickets (user ids ``user_a`` < ``user_b``,
+    ``tickets``, ``agreement`` and ``kappa``), most shared tickets first.
+    """
+    np = _np()
+    ticket, verdict = history['ticket'], history['verdict']
+    user_ids, user_index = _dense(history['user'])
+    users = len(user_ids)
+    result = {'tickets': 0, 'agreement': None, 'fleiss_kappa': None, 'cohen_kappa': None, 'pairs': []}
+    if not len(ticket):
+        return result
+
+    # Each annotator's latest verdict per ticket, grouped by ticket
+    keys, order = _sort(ticket * users + user_index)
+    latest = np.append(_starts(keys)[1:], len(keys)) - 1
+    ticket, user_index = np.divmod(keys[latest], users)
+    verdict = verdict[order[latest]]
+
+    # Fleiss' kappa over the tickets with several annotators, allowing a
+    # different number of annotators per ticket
+    starts = _starts(ticket)
+    raters = np.diff(np.append(starts, len(ticket)))
+    positive = np.add.reduceat(verdict, starts, dtype=np.int64)
+    shared = raters > 1
+    raters, positive = raters[shared], positive[shared]
+    result['tickets'] = len(raters)
+    if not len(raters):
+        return result
+    negative = raters - positive
+    per_ticket = (positive * (positive - 1) + negative * (negative - 1)) / (raters * (raters - 1))
+    p = positive.sum() / raters.sum()
+    result['agreement'] = float(per_ticket.mean())
+    result['fleiss_kappa'] = _kappa(per_ticket.mean(), p * p + (1 - p) * (1 - p))
+
+    # 2x2 verdict counts per pair of annotators, adding up the pairs of rows
+    # on the same ticket one distance at a time, up to the most annotators
+    # of a ticket. Rows of a ticket are ordered by annotator, so the left
+    # one has the lower index.
+    counts = np.zeros(users * users * 4, dtype=np.int64)
+    for distance in range(1, len(ticket)):
+        left = np.flatnonzero(ticket[distance:] == ticket[:-distance])
+        if not len(left):
+            break
+        right = left + distance
+        pair = user_index[left] * users + user_index[right]
+        counts += np.bincount(pair * 4 + verdict[left] * 2 + verdict[right], minlength=len(counts))
+    counts = counts.reshape(-1, 4)
+    n = counts.sum(axis=1)
+    pairs = np.flatnonzero(n)
+    counts, n = counts[pairs], n[pairs]
+    observed = (counts[:, 0] + counts[:, 3]) / n
+    pa, pb = (counts[:, 2] + counts[:, 3]) / n, (counts[:, 1] + counts[:, 3]) / n
+    expected = pa * pb + (1 - pa) * (1 - pb)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kappas = np.where(expected < 1, (observed - expected) / (1 - expected), np.nan)
+    defined = ~np.isnan(kappas)
+    if defined.any():
+        result['cohen_kappa'] = float(np.average(kappas[defined], weights=n[defined]))
+
+    for i in np.argsort(-n, kind='stable'):
+        if n[i] < min_shared:
+            break
+        result['pairs'].append({
+            'user_a': int(user_ids[pairs[i] // users]),
+            'user_b': int(user_ids[pairs[i] % users]),
+            'tickets': int(n[i]),
+            'agreement': float(observed[i]),
+            'kappa': float(kappas[i]) if defined[i] else None
+        })
+    return result
+
+
+def throughput(history, idle_seconds=IDLE_SECONDS):
+    """
+    Count each annotator's labels per active hour.
+
+    Active time is the sum of the gaps between an annotator's consecutive
+    annotations, leaving out gaps longer than ``idle_seconds``. Returns one
+    dict per annotator (``user_id``, ``labels``, ``active_hours``,
+    ``labels_per_hour``, None without active time, and the ``first`` and
+    ``last`` annotation times), most labels first.
+    """
+    np = _np()
+    user_ids, user_index = _dense(history['user'])
+    user_index, order = _sort(user_index)
+    times = history['time'][order]
+
+    gaps = np.diff(times)
+    active = (user_index[1:] == user_index[:-1]) & (gaps >= 0) & (gaps <= idle_seconds)
+    seconds = np.bincount(user_index[1:][active], weights=gaps[active], minlength=len(user_ids))
+    labels = np.bincount(user_index, minlength=len(user_ids))
+    starts = _starts(user_index)
+    first, last = np.minimum.reduceat(times, starts), np.maximum.reduceat(times, starts)
+
+    return [{
+        'user_id': int(user_ids[i]),
+        'labels': int(labels[i]),
+        'active_hours': float(seconds[i] / 3600.0),
+        'labels_per_hour': float(labels[i] / (seconds[i] / 3600.0)) if seconds[i] else None,
+        'first': datetime.utcfromtimestamp(int(first[i])),
+        'last': datetime.utcfromtimestamp(int(last[i]))
+    } for i in np.argsort(-labels, kind='stable')]
+
+
+def flips(history, limit=FLIPS_LIMIT):
+    """
+    Find tickets whose verdict changed between consecutive annotations.
+
+    Returns the number of flipped ``tickets``, the total number of
+    ``flips`` and ``top``, up to ``limit`` dicts (``ticket``, ``flips``,
+    ``annotations`` and the ``label`` of the latest annotation) for the
+    tickets with the most flips, most recently annotated first among equals.
+    """
+    np = _np()
+    ticket, order = _sort(history['ticket'])
+    verdict = history['verdict'][order]
+    starts = _starts(ticket)
+    annotations = np.diff(np.append(starts, len(ticket)))
+    changed = np.append(False, (ticket[1:] == ticket[:-1]) & (verdict[1:] != verdict[:-1]))
+    per_ticket = np.add.reduceat(changed, starts, dtype=np.int64) if len(starts) else annotations
+    lasts = starts + annotations - 1
+
+    flipped = np.flatnonzero(per_ticket)
+    last_times = history['time'][order[lasts[flipped]]]
+    top = flipped[np.lexsort((-last_times, -per_ticket[flipped]))[:limit]]
+    return {
+        'tickets': len(flipped),
+        'flips': int(per_ticket.sum()),
+        'top': [{'ticket': int(ticket[starts[i]]), 'flips': int(per_ticket[i]),
+                 'annotations': int(annotations[i]), 'label': label_for(bool(verdict[lasts[i]]))}
+                for i in top]
+    }
+
+
+def report(columns=None):
+    """
+    Compute every annotation report from the history ``columns``.
+
+    ``columns`` defaults to the current application's history, brought up
+    to date. Annotators are identified by email and flipped tickets by
+    their Zendesk ticket id, both looked up for the reported rows only.
+    """
+    columns = columns if columns is not None else history().update()
+    result = {
+        'annotations': len(columns['ticket']),
+        'agreement': agreement(columns),
+        'throughput': throughput(columns),
+        'flips': flips(columns)
+    }
+
+    emails = dict(db.session.execute(select(User.id, User.email)).all())
+    for pair in result['agreement']['pairs']:
+        pair['annotator_a'], pair['annotator_b'] = emails.get(pair['user_a']), emails.get(pair['user_b'])
+    for row in result['throughput']:
+        row['annotator'] = emails.get(row['user_id'])
+    top = result['flips']['top']
+    zendesk_ids = dict(db.session.execute(select(Ticket.id, Ticket.ticket_id)
+                                          .where(Ticket.id.in_([row['ticket'] for row in top]))).all())
+    for row in top:
+        row['ticket_id'] = zendesk_ids.get(row['ticket'])
+    return result
@@ -0,0 +1,96 @@
+"""
+Result caching for the Ticket Annotation Tool.
+
+Dashboard results are cached per web worker in a size-bounded LRU cache.
+Entries are tagged with the data version, a counter in the ``data_version``
+table that annotations and imports bump in the same transaction as their
+writes. A request that sees a newer version than the cache holds discards
+every entry, so all workers stop serving stale results as soon as a write
+commits.
+"""
+from collections import OrderedDict
+from threading import Lock
+from flask import current_app
+from sqlalchemy import select, update
+from app import db
+from app.models import DataVersion
+
+
+class LRUCache:
+    """A thread-safe mapping of at most ``maxsize`` entries for one data version."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, version):
+        """Return the value cached for ``key`` at ``version``, or None."""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, version, value):
+        """Cache ``value`` for ``key``, evicting the least recently used entry when full."""
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Discard every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the cache's size and hit and miss counters."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'version': self.version,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def init_app(app):
+    """Attach the dashboard cache to ``app``."""
+    app.extensions['dashboard_cache'] = LRUCache(app.config['DASHBOARD_CACHE_SIZE'])
+
+
+def dashboard_cache():
+    """Return the dashboard cache of the current application."""
+    return current_app.extensions['dashboard_cache']
+
+
+def data_version():
+    """Return the current data version."""
+    return db.session.execute(select(DataVersion.version).where(DataVersion.id == 1)).scalar() or 0
+
+
+def bump_data_version():
+    """
+    Increment the data version in the current session.
+
+    The caller commits the bump together with the change it describes.
+    """
+    result = db.session.execute(update(DataVersion)
+                                .where(DataVersion.id == 1)
+                                .values(version=DataVersion.version + 1))
+    if result.rowcount == 0:
+        db.session.add(DataVersion(id=1, version=1))
+        db.session.flush()
@@ -0,0 +1,120 @@
+"""
+Command line interface for the Ticket Annotation Tool.
+
+Commands are registered on the ``flask`` command, e.g. ``flask repair-labels``.
+"""
+import click
+import flask_migrate
+from flask import Blueprint, current_app
+from sqlalchemy import inspect, select, text, update
+from app import db, duplicates, exporter, importer, labels, rollup, search
+from app.models import Ticket
+
+bp = Blueprint('cli', __name__, cli_group=None)
+
+@bp.cli.command('init-db')
+def init_db():
+    """Create the tables of a new database and mark it as migrated to the latest revision."""
+    if inspect(db.engine).has_table('ticket'):
+        raise click.ClickException('The database already has tables; run `flask db upgrade` instead.')
+    db.create_all()
+    search.create_index()
+    flask_migrate.stamp()
+    click.echo('Created the database tables.')
+
+@bp.cli.command('repair-labels')
+@click.option('--chunk-size', default=10000, show_default=True,
+              help='Number of tickets updated per statement.')
+def repair_labels(chunk_size):
+    """Backfill or repair the label state stored on tickets."""
+    repaired = labels.repair_label_state(chunk_size=chunk_size)
+    click.echo('Updated label state for %d tickets.' % repaired)
+
+@bp.cli.command('rebuild-rollup')
+def rebuild_rollup():
+    """Recompute the daily_category_stats rollup from the tickets."""
+    rows = rollup.rebuild()
+    click.echo('Rebuilt daily_category_stats with %d rows.' % rows)
+
+@bp.cli.command('rebuild-search')
+def rebuild_search():
+    """Recreate the full-text search index from the tickets."""
+    indexed = search.rebuild()
+    click.echo('Indexed %d tickets for search.' % indexed)
+
+@bp.cli.command('rebuild-duplicates')
+@click.option('--chunk-size', default=2000, show_default=True,
+              help='Number of tickets indexed at a time.')
+def rebuild_duplicates(chunk_size):
+    """Recompute the near-duplicate index and clusters from the tickets."""
+    clusters = duplicates.rebuild(chunk_size=chunk_size)
+    click.echo('Found %d clusters of near-duplicate tickets.' % clusters)
+
+@bp.cli.command('compress-tickets')
+@click.option('--chunk-size', default=5000, show_default=True,
+              help='Number of tickets rewritten per statement.')
+@click.option('--vacuum', is_flag=True, help='Run VACUUM afterwards to return freed space to the file system.')
+def compress_tickets(chunk_size, vacuum):
+    """Rewrite ticket text with the current COMPRESS_TICKET_TEXT setting."""
+    columns = [Ticket.summary, Ticket.conversation, Ticket.issue_description]
+    stmt = select(Ticket.id, *columns).order_by(Ticket.id)
+    last_id, rewritten = 0, 0
+    while True:
+        rows = db.session.execute(stmt.where(Ticket.id > last_id).limit(chunk_size)).all()
+        if not rows:
+            break
+        db.session.execute(update(Ticket), [row._asdict() for row in rows])
+        db.session.commit()
+        last_id = rows[-1].id
+        rewritten += len(rows)
+    click.echo('Rewrote the text of %d tickets.' % rewritten)
+    if vacuum:
+        db.session.execute(text('VACUUM'))
+        click.echo('Vacuumed the database.')
+
+@bp.cli.command('export-annotations')
+@click.argument('path')
+@click.option('--format', 'fmt', type=click.Choice(sorted(exporter.FORMATS)),
+              help='Output format (default: from the file extension, else jsonl).')
+@click.option('--history', is_flag=True, help='Export every annotation instead of the latest per ticket.')
+@click.option('--include-unlabeled', is_flag=True, help='Include tickets that have not been annotated.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Number of rows read and encoded at a time.')
+def export_annotations(path, fmt, history, include_unlabeled, chunk_size):
+    """Export annotated tickets to PATH as gzipped JSON Lines, gzipped CSV or Parquet."""
+    if fmt is None:
+        fmt = next((name for name, (extension, _) in exporter.FORMATS.items()
+                    if path.endswith('.' + extension)), 'jsonl')
+    try:
+        chunks = exporter.stream(fmt, history, include_unlabeled, chunk_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    written = 0
+    with click.open_file(path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            written += len(chunk)
+    click.echo('Exported %s to %s (%.1f MiB).' % (fmt, path, written / 2.0 ** 20), err=path == '-')
+
+@bp.cli.command('import-tickets')
+@click.argument('path', required=False)
+@click.option('--chunk-size', type=int, help='Number of records written per bulk insert.')
+@click.option('--full', is_flag=True, help='Re-read the whole file even if it was imported before.')
+def import_tickets(path, chunk_size, full):
+    """Import new and changed tickets from a gzipped JSON Lines file (default TICKETS_JSON_FILE)."""
+    path = path or current_app.config['TICKETS_JSON_FILE']
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+
+    def progress(stats):
+        click.echo('%d read, %d added, %d updated, %d unchanged, %d skipped (%.0f rows/sec)'
+                   % (stats.read, stats.added, stats.updated, stats.unchanged, stats.skipped,
+                      stats.rows_per_sec))
+
+    result = importer.import_tickets(path, chunk_size=chunk_size, progress=progress,
+                                     resume=not full)
+    if result.up_to_date:
+        click.echo('%s has not changed since the last import.' % path)
+        return
+    if result.resumed_from:
+        click.echo('Resumed at byte offset %d.' % result.resumed_from)
+    click.echo('Imported %s in %.1fs: %d added, %d updated (%.0f rows/sec).'
+               % (path, result.elapsed, result.added, result.updated, result.rows_per_sec))
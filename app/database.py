@@ -0,0 +1,86 @@
+"""
+Database engine profile for the Ticket Annotation Tool.
+
+SQLite's defaults suit a single process: a rollback journal lets readers
+block writers and a write lock that cannot be taken fails with "database is
+locked" after a short timeout. The production profile switches every
+connection to WAL mode with ``synchronous=NORMAL``, waits on locks for
+``SQLITE_BUSY_TIMEOUT`` milliseconds and enlarges the page cache and memory
+map. Connection pool sizing applies to every file-backed database.
+``begin_read`` gives a request's reads a single snapshot.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def _is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def _is_memory(uri):
+    url = make_url(uri)
+    return _is_sqlite(uri) and url.database in (None, '', ':memory:')
+
+
+def engine_options(config):
+    """
+    Return the ``SQLALCHEMY_ENGINE_OPTIONS`` implied by ``config``.
+
+    Options set explicitly in the config take precedence.
+    """
+    options = {}
+    if not _is_memory(config['SQLALCHEMY_DATABASE_URI']):
+        options.update(pool_size=config['DB_POOL_SIZE'],
+                       max_overflow=config['DB_MAX_OVERFLOW'],
+                       pool_timeout=config['DB_POOL_TIMEOUT'])
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def sqlite_pragmas(config):
+    """Return the ``(name, value)`` pragmas applied to new SQLite connections."""
+    if config['SQLITE_PROFILE'] != 'production':
+        return []
+    return [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        ('cache_size', config['SQLITE_CACHE_SIZE']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+    ]
+
+
+def configure_engine(engine, config):
+    """Apply the SQLite pragmas of ``config`` to every new connection of ``engine``."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(config)
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute('PRAGMA %s = %s' % (name, value))
+        finally:
+            cursor.close()
+
+
+def begin_read(session):
+    """
+    Start a read transaction in ``session``, so its following reads see one snapshot.
+
+    Python's sqlite3 driver only opens a transaction before a write and runs
+    every SELECT on its own, so two reads that must agree, like a cached
+    summary's data version and the latest change it includes, could
+    otherwise see different commits. Does nothing if a transaction is
+    already open. The transaction ends when the session commits or rolls
+    back.
+    """
+    connection = session.connection()
+    if connection.dialect.name != 'sqlite':
+        return
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN')
@@ -0,0 +1,344 @@
+"""
+Near-duplicate ticket clusters for the Ticket Annotation Tool.
+
+Many tickets repeat nearly the same summary and issue description. Each
+ticket's text is reduced to a MinHash signature of its word pairs, stored
+in ``ticket_signature``, and the signature's ``BANDS`` bands are hashed
+into ``ticket_band`` buckets (locality-sensitive hashing). Tickets sharing
+a bucket are candidates, and candidates whose signatures agree on at least
+``DUPLICATE_THRESHOLD`` of their values, an estimate of the Jaccard
+similarity of their word pairs, are joined into one cluster in
+``ticket_cluster``, identified by its smallest ticket id. Only tickets with
+near-duplicates belong to a cluster.
+
+The importer indexes tickets chunk by chunk, so the work and memory of
+indexing depend on the chunk size rather than the number of tickets, and
+``rebuild`` recomputes everything. Clusters grow as tickets are added; a
+changed ticket leaves its cluster and is matched again, but clusters it
+bridged are only split by a rebuild. NumPy is imported on first use to
+keep it off the application's startup path.
+"""
+import re
+import zlib
+from flask import current_app
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.models import Ticket, TicketSignature, TicketBand, TicketCluster
+
+# Signatures hold BANDS bands of ROWS values
+BANDS = 8
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+
+# Tickets kept per bucket. Tickets falling into a full bucket are still
+# compared with its members but not added, which bounds the candidates of
+# a ticket when thousands of tickets share the same text.
+MAX_BUCKET_SIZE = 50
+
+# Columns whose text is compared
+TEXT_COLUMNS = ('summary', 'issue_description')
+
+# Smallest prime above 2**32, the modulus of the hash permutations
+_PRIME = 4294967311
+# Multipliers combining the values of a band into its bucket
+_BAND_MULTIPLIERS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5)
+_permutations = None
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+def _get_permutations():
+    """Return the ``(a, b)`` coefficients of the NUM_PERM hash permutations ``(a * h + b) % _PRIME``."""
+    global _permutations
+    if _permutations is None:
+        np = _np()
+        # A fixed seed, so signatures stay comparable across processes
+        rng = np.random.RandomState(1)
+        _permutations = (rng.randint(1, 2 ** 31, NUM_PERM).astype(np.uint64),
+                         rng.randint(0, 2 ** 31, NUM_PERM).astype(np.uint64))
+    return _permutations
+
+
+def shingles(text):
+    """Return the set of lowercase word pairs in ``text``, or its single word."""
+    words = re.findall(r'\w+', (text or '').lower())
+    if len(words) < 2:
+        return set(words)
+    return {words[i] + ' ' + words[i + 1] for i in range(len(words) - 1)}
+
+
+def ticket_text(row):
+    """Return the compared text of a ticket row or dict."""
+    return '\n'.join(row[name] or '' for name in TEXT_COLUMNS)
+
+
+def signatures(texts):
+    """
+    Return the MinHash signatures of ``texts``.
+
+    Returns a ``(len(texts), NUM_PERM)`` uint32 array and a boolean array
+    telling which texts had any words; rows of texts without words are zero.
+    """
+    np = _np()
+    a, b = _get_permutations()
+    hashes, lengths = [], []
+    for text in texts:
+        # crc32 rather than hash(), which is salted per process
+        values = {zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)}
+        hashes.extend(values)
+        lengths.append(len(values))
+
+    lengths = np.array(lengths, dtype=np.int64)
+    present = lengths > 0
+    result = np.zeros((len(texts), NUM_PERM), dtype=np.uint32)
+    if hashes:
+        permuted = (np.array(hashes, dtype=np.uint64)[:, None] * a + b) % np.uint64(_PRIME)
+        starts = (np.cumsum(lengths) - lengths)[present]
+        result[present] = np.minimum.reduceat(permuted, starts, axis=0) & np.uint64(0xFFFFFFFF)
+    return result, present
+
+
+def buckets(sigs):
+    """Return the bucket of each band of ``sigs`` as an ``(n, BANDS)`` array of non-negative int64."""
+    np = _np()
+    bands = sigs.reshape(len(sigs), BANDS, ROWS).astype(np.uint64)
+    with np.errstate(over='ignore'):
+        keys = (bands * np.array(_BAND_MULTIPLIERS, dtype=np.uint64)).sum(axis=2, dtype=np.uint64)
+    # 63 bits, so buckets fit SQLite's signed integers
+    return (keys >> np.uint64(1)).astype(np.int64)
+
+
+def _chunks(values, size=500):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _load_signatures(ticket_ids):
+    """Return a dict mapping ticket ids to their stored signatures."""
+    np = _np()
+    loaded = {}
+    for chunk in _chunks(ticket_ids):
+        for ticket_id, signature in db.session.execute(
+                select(TicketSignature.ticket_id, TicketSignature.signature)
+                .where(TicketSignature.ticket_id.in_(chunk))):
+            loaded[ticket_id] = np.frombuffer(signature, dtype='<u4')
+    return loaded
+
+
+def bucket_members(keys):
+    """Return a dict mapping the ``(band, bucket)`` pairs of ``keys`` to the ids of their tickets."""
+    members = {}
+    # Looked up band by band, as SQLite scans the whole table for a
+    # (band, bucket) IN list
+    for band in range(BANDS):
+        for chunk in _chunks({int(key) for key in keys[:, band]}):
+            for bucket, ticket_id in db.session.execute(
+                    select(TicketBand.bucket, TicketBand.ticket_id)
+                    .where(TicketBand.band == band, TicketBand.bucket.in_(chunk))):
+                members.setdefault((band, bucket), []).append(ticket_id)
+    return members
+
+
+def similarity(sig, others):
+    """Return the estimated Jaccard similarity of signature ``sig`` with each row of ``others``."""
+    return (others == sig).mean(axis=1)
+
+
+def index_tickets(rows):
+    """
+    Add tickets to the index and join them to clusters of their near-duplicates.
+
+    ``rows`` are dicts with ``id`` and the text columns of tickets not yet
+    indexed; use ``remove_tickets`` first for changed tickets. The caller
+    commits.
+    """
+    np = _np()
+    sigs, present = signatures([ticket_text(row) for row in rows])
+    ticket_ids = [row['id'] for row, has_words in zip(rows, present) if has_words]
+    sigs = sigs[present]
+    if not ticket_ids:
+        return
+    keys = buckets(sigs)
+    db.session.execute(insert(TicketSignature), [
+        {'ticket_id': ticket_id, 'signature': sig.astype('<u4').tobytes()}
+        for ticket_id, sig in zip(ticket_ids, sigs)
+    ])
+
+    members = bucket_members(keys)
+    # Tickets of this chunk become members for the tickets after them
+    candidates, new_bands = {}, []
+    for ticket_id, row in zip(ticket_ids, keys):
+        found = set()
+        for band, key in enumerate(row):
+            bucket = members.setdefault((band, int(key)), [])
+            found.update(bucket)
+            if len(bucket) < MAX_BUCKET_SIZE:
+                bucket.append(ticket_id)
+                new_bands.append({'band': band, 'bucket': int(key), 'ticket_id': ticket_id})
+        if found:
+            candidates[ticket_id] = found
+    if new_bands:
+        db.session.execute(insert(TicketBand), new_bands)
+    if not candidates:
+        return
+
+    known = dict(zip(ticket_ids, sigs))
+    known.update(_load_signatures({other for found in candidates.values() for other in found} - set(known)))
+    threshold = current_app.config['DUPLICATE_THRESHOLD']
+    pairs = []
+    for ticket_id, found in candidates.items():
+        others = [other for other in found if other in known]
+        if others:
+            scores = similarity(known[ticket_id], np.array([known[other] for other in others]))
+            pairs.extend((ticket_id, other) for other, score in zip(others, scores) if score >= threshold)
+    _join(pairs)
+
+
+def _join(pairs):
+    """Merge the clusters of each pair of near-duplicate tickets."""
+    if not pairs:
+        return
+    involved = {ticket_id for pair in pairs for ticket_id in pair}
+    existing = {}
+    for chunk in _chunks(involved):
+        existing.update(db.session.execute(
+            select(TicketCluster.ticket_id, TicketCluster.cluster_id).where(TicketCluster.ticket_id.in_(chunk))
+        ).all())
+
+    # Union-find over ticket ids; a cluster id is its smallest member's id
+    parent = {}
+
+    def find(node):
+        root = parent.setdefault(node, node)
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    def union(first, second):
+        first, second = find(first), find(second)
+        if first != second:
+            parent[max(first, second)] = min(first, second)
+
+    for ticket_id, cluster_id in existing.items():
+        union(ticket_id, cluster_id)
+    for first, second in pairs:
+        union(first, second)
+
+    renamed = {cluster_id: find(cluster_id) for cluster_id in set(existing.values())
+               if find(cluster_id) != cluster_id}
+    if renamed:
+        table = TicketCluster.__table__
+        db.session.execute(
+            update(table).where(table.c.cluster_id == bindparam('b_old')).values(cluster_id=bindparam('b_new')),
+            [{'b_old': old, 'b_new': new} for old, new in renamed.items()]
+        )
+    stmt = sqlite_insert(TicketCluster)
+    db.session.execute(
+        stmt.on_conflict_do_update(index_elements=[TicketCluster.ticket_id],
+                                   set_={'cluster_id': stmt.excluded.cluster_id}),
+        [{'ticket_id': ticket_id, 'cluster_id': find(ticket_id)} for ticket_id in involved]
+    )
+
+
+def remove_tickets(ticket_ids):
+    """
+    Remove tickets from the index and their clusters.
+
+    Clusters left with a single ticket are dropped and clusters that lost
+    their smallest ticket are renumbered. The caller commits.
+    """
+    if not ticket_ids:
+        return
+    old = _load_signatures(ticket_ids)
+    if old:
+        ids = list(old)
+        keys = buckets(_np().array([old[ticket_id] for ticket_id in ids]))
+        table = TicketBand.__table__
+        db.session.execute(
+            delete(table).where(table.c.band == bindparam('b_band'), table.c.bucket == bindparam('b_bucket'),
+                                table.c.ticket_id == bindparam('b_ticket_id')),
+            [{'b_band': band, 'b_bucket': int(key), 'b_ticket_id': ticket_id}
+             for ticket_id, row in zip(ids, keys) for band, key in enumerate(row)]
+        )
+    affected = set()
+    for chunk in _chunks(ticket_ids):
+        db.session.execute(delete(TicketSignature).where(TicketSignature.ticket_id.in_(chunk)))
+        affected.update(db.session.execute(
+            select(TicketCluster.cluster_id).where(TicketCluster.ticket_id.in_(chunk))).scalars())
+        db.session.execute(delete(TicketCluster).where(TicketCluster.ticket_id.in_(chunk)))
+
+    for chunk in _chunks(affected):
+        remaining = db.session.execute(
+            select(TicketCluster.cluster_id, func.min(TicketCluster.ticket_id), func.count())
+            .where(TicketCluster.cluster_id.in_(chunk))
+            .group_by(TicketCluster.cluster_id)).all()
+        singles = [cluster_id for cluster_id, _, size in remaining if size < 2]
+        if singles:
+            db.session.execute(delete(TicketCluster).where(TicketCluster.cluster_id.in_(singles)))
+        for cluster_id, smallest, size in remaining:
+            if size >= 2 and smallest != cluster_id:
+                db.session.execute(update(TicketCluster).where(TicketCluster.cluster_id == cluster_id)
+                                   .values(cluster_id=smallest).execution_options(synchronize_session=False))
+
+
+def rebuild(chunk_size=2000):
+    """Recompute the index and clusters from the ``Ticket`` table, commit, and return the number of clusters."""
+    for model in (TicketCluster, TicketBand, TicketSignature):
+        db.session.execute(delete(model))
+    # Read through the ORM columns so compressed text is compared decompressed
+    stmt = select(Ticket.id, *[getattr(Ticket, name) for name in TEXT_COLUMNS]).order_by(Ticket.id)
+    last_id = 0
+    while True:
+        rows = db.session.execute(stmt.where(Ticket.id > last_id).limit(chunk_size)).all()
+        if not rows:
+            break
+        index_tickets([row._asdict() for row in rows])
+        db.session.commit()
+        last_id = rows[-1].id
+    return db.session.execute(select(func.count(func.distinct(TicketCluster.cluster_id)))).scalar()
+
+
+def near_duplicates(ticket_id, limit=50, max_members=2000):
+    """
+    Return the cluster of ``ticket_id`` and its most similar other members.
+
+    Returns ``(cluster_id, size, members)`` where ``members`` are up to
+    ``limit`` ``(ticket_id, similarity)`` pairs, most similar first, chosen
+    from the first ``max_members`` members of the cluster. ``cluster_id``
+    is None and ``members`` empty for tickets without near-duplicates.
+    """
+    np = _np()
+    cluster_id = db.session.execute(
+        select(TicketCluster.cluster_id).where(TicketCluster.ticket_id == ticket_id)).scalar()
+    if cluster_id is None:
+        return None, 0, []
+    size = db.session.execute(
+        select(func.count()).where(TicketCluster.cluster_id == cluster_id)).scalar()
+    others = db.session.execute(
+        select(TicketCluster.ticket_id).where(TicketCluster.cluster_id == cluster_id,
+                                              TicketCluster.ticket_id != ticket_id)
+        .order_by(TicketCluster.ticket_id).limit(max_members)).scalars().all()
+    sigs = _load_signatures([ticket_id] + others)
+    others = [other for other in others if other in sigs]
+    if ticket_id not in sigs or not others:
+        return cluster_id, size, []
+    scores = similarity(sigs[ticket_id], np.array([sigs[other] for other in others]))
+    ranked = sorted(zip(others, scores.tolist()), key=lambda item: (-item[1], item[0]))
+    return cluster_id, size, ranked[:limit]
+
+
+def cluster_members(cluster_id, ticket_ids):
+    """Return the subset of ``ticket_ids`` that belong to cluster ``cluster_id``."""
+    found = set()
+    for chunk in _chunks(ticket_ids):
+        found.update(db.session.execute(
+            select(TicketCluster.ticket_id).where(TicketCluster.cluster_id == cluster_id,
+                                                  TicketCluster.ticket_id.in_(chunk))).scalars())
+    return found
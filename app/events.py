@@ -0,0 +1,137 @@
+"""
+Live dashboard updates for the Ticket Annotation Tool.
+
+Annotations that change a ticket's label record one ``LabelEvent`` per
+category of the ticket, in the same transaction as the label state and the
+rollup. Open dashboards follow ``/api/dashboard/events``, a server-sent
+event stream of these changes, and apply them to their summary table and
+chart in place instead of reloading. A stream checks for new events every
+``DASHBOARD_EVENTS_POLL_SECONDS`` without holding a database connection
+in between, and closes after ``DASHBOARD_EVENTS_STREAM_SECONDS``; the
+browser then reconnects and resumes after the last event it received.
+Events older than ``LABEL_EVENT_RETENTION_HOURS`` are pruned; a dashboard
+that falls further behind is told to reload.
+"""
+import json
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, text
+from app import db
+from app.models import Category, LabelEvent
+
+# Milliseconds the browser waits before reconnecting a closed stream
+RETRY_MS = 3000
+# Seconds between comments that keep idle streams open through proxies
+HEARTBEAT_SECONDS = 15
+# Events sent in one message at most
+BATCH_SIZE = 1000
+
+
+def record(changes):
+    """
+    Add label events for ``changes`` in the current session.
+
+    ``changes`` are ``(ticket_id, day, category_ids, old_label, new_label)``
+    tuples; unchanged labels are skipped. The caller commits.
+    """
+    now = datetime.utcnow()
+    rows = [{'created_at': now, 'ticket_id': ticket_id,
+             'date': day.date() if isinstance(day, datetime) else day,
+             'category_id': category_id, 'old_label': old_label, 'new_label': new_label}
+            for ticket_id, day, category_ids, old_label, new_label in changes
+            if old_label != new_label
+            for category_id in category_ids]
+    if rows:
+        db.session.execute(insert(LabelEvent), rows)
+
+
+def last_id():
+    """
+    Return the id of the latest label event recorded, or 0 if there have been none.
+
+    Pruning doesn't lower it: on SQLite it is read from ``sqlite_sequence``,
+    where AUTOINCREMENT keeps the largest id issued even once that event has
+    been deleted.
+    """
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return db.session.execute(
+            text("SELECT seq FROM sqlite_sequence WHERE name = 'label_event'")).scalar() or 0
+    return db.session.execute(select(func.max(LabelEvent.id))).scalar() or 0
+
+
+def since(after_id, limit=1000):
+    """Return up to ``limit`` events following ``after_id`` as dicts, oldest first."""
+    stmt = (select(LabelEvent.id, LabelEvent.date, LabelEvent.category_id, Category.name,
+                   LabelEvent.old_label, LabelEvent.new_label)
+            .join(Category, Category.id == LabelEvent.category_id)
+            .where(LabelEvent.id > after_id)
+            .order_by(LabelEvent.id)
+            .limit(limit))
+    return [{'id': event_id, 'date': day.isoformat() if day else None, 'category_id': category_id,
+             'category': category, 'old_label': old_label, 'new_label': new_label}
+            for event_id, day, category_id, category, old_label, new_label in db.session.execute(stmt)]
+
+
+def prune(hours=None):
+    """Delete events older than ``hours`` (default ``LABEL_EVENT_RETENTION_HOURS``), commit, and return their number."""
+    cutoff = datetime.utcnow() - timedelta(hours=hours or current_app.config['LABEL_EVENT_RETENTION_HOURS'])
+    deleted = db.session.execute(delete(LabelEvent).where(LabelEvent.created_at < cutoff)).rowcount
+    db.session.commit()
+    return deleted
+
+
+def is_stale(after_id):
+    """Return whether events following ``after_id`` have already been pruned."""
+    oldest = db.session.execute(select(func.min(LabelEvent.id))).scalar()
+    if oldest is None:
+        # Every event has been pruned, including any after after_id
+        return after_id < last_id()
+    return after_id < oldest - 1
+
+
+def _message(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append('id: %d' % event_id)
+    if event:
+        lines.append('event: %s' % event)
+    lines.append('data: %s' % json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream(after_id, poll_seconds=None, max_seconds=None):
+    """
+    Yield the server-sent event stream of label events following ``after_id``.
+
+    Each check for new events sends them as one ``labels`` event whose id is
+    the last event's id. Must run inside an application context, e.g.
+    wrapped in ``stream_with_context``.
+    """
+    poll_seconds = poll_seconds or current_app.config['DASHBOARD_EVENTS_POLL_SECONDS']
+    max_seconds = max_seconds or current_app.config['DASHBOARD_EVENTS_STREAM_SECONDS']
+    deadline = time.monotonic() + max_seconds
+    heartbeat = time.monotonic()
+    yield 'retry: %d\n\n' % RETRY_MS
+    if is_stale(after_id):
+        db.session.rollback()
+        yield _message({'after': after_id}, event='reload')
+        return
+
+    while True:
+        events = since(after_id, BATCH_SIZE)
+        # End the read transaction, so the next check sees new commits and
+        # no connection is held while waiting
+        db.session.rollback()
+        if events:
+            after_id = events[-1]['id']
+            heartbeat = time.monotonic()
+            yield _message(events, event='labels', event_id=after_id)
+            if len(events) == BATCH_SIZE:
+                continue
+        elif time.monotonic() - heartbeat >= HEARTBEAT_SECONDS:
+            heartbeat = time.monotonic()
+            yield ': keep-alive\n\n'
+        if time.monotonic() + poll_seconds > deadline:
+            return
+        time.sleep(poll_seconds)
@@ -0,0 +1,213 @@
+"""
+Annotation export for the Ticket Annotation Tool.
+
+Exports labeled tickets with their latest annotation, or the full
+annotation history with annotators, as gzipped JSON Lines, gzipped CSV or
+Parquet. Rows are read with ``yield_per`` and encoded batch by batch into a
+stream of bytes, so exports of millions of rows run in constant memory
+whether they are written to a file or sent as a streaming response.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from sqlalchemy import case, func, select
+from app import db
+from app.models import Ticket, Category, Annotation, User
+from app.models.models import ticket_category
+
+# Format name: (file extension, MIME type)
+FORMATS = {
+    'jsonl': ('jsonl.gz', 'application/gzip'),
+    'csv': ('csv.gz', 'application/gzip'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+CATEGORY_SEPARATOR = ';'
+
+
+def export_query(history=False, include_unlabeled=False):
+    """
+    Return the select of rows to export.
+
+    By default one row per labeled ticket with its text, categories and
+    latest annotation; with ``history`` one row per annotation. Unlabeled
+    tickets are only included with ``include_unlabeled``.
+    """
+    if history:
+        return (select(Annotation.id.label('annotation_id'),
+                       Ticket.id.label('ticket'),
+                       Ticket.ticket_id,
+                       case((Annotation.is_app_issue == True, 'positive'), else_='negative').label('label'),
+                       Annotation.rationale,
+                       User.email.label('annotator'),
+                       Annotation.created_at.label('annotated_at'))
+                .join(Ticket, Ticket.id == Annotation.ticket_id)
+                .join(User, User.id == Annotation.user_id)
+                .order_by(Annotation.id))
+
+    categories = (select(func.group_concat(Category.name, CATEGORY_SEPARATOR))
+                  .join(ticket_category, ticket_category.c.category_id == Category.id)
+                  .where(ticket_category.c.ticket_id == Ticket.id)
+                  .scalar_subquery())
+    stmt = (select(Ticket.id.label('ticket'),
+                   Ticket.ticket_id,
+                   Ticket.subject,
+                   Ticket.summary,
+                   Ticket.conversation,
+                   Ticket.issue_description,
+                   Ticket.tech_issue_likelihood,
+                   Ticket.created_at_zendesk,
+                   categories.label('categories'),
+                   Ticket.current_label.label('label'),
+                   Ticket.annotation_count,
+                   Annotation.rationale,
+                   User.email.label('annotator'),
+                   Annotation.created_at.label('annotated_at'))
+            .outerjoin(Annotation, Annotation.id == Ticket.latest_annotation_id)
+            .outerjoin(User, User.id == Annotation.user_id)
+            .order_by(Ticket.id))
+    if not include_unlabeled:
+        stmt = stmt.where(Ticket.current_label.in_(('positive', 'negative')))
+    return stmt
+
+
+def count(history=False, include_unlabeled=False):
+    """Return the number of rows an export would contain."""
+    stmt = export_query(history, include_unlabeled).order_by(None)
+    return db.session.execute(select(func.count()).select_from(stmt.subquery())).scalar()
+
+
+def batches(stmt, chunk_size=1000):
+    """Yield the rows of ``stmt`` as lists of dicts of up to ``chunk_size`` rows."""
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    keys = list(result.keys())
+    for partition in result.partitions():
+        rows = [dict(zip(keys, row)) for row in partition]
+        for row in rows:
+            if 'categories' in row:
+                row['categories'] = row['categories'].split(CATEGORY_SEPARATOR) if row['categories'] else []
+        yield rows
+
+
+def stream(fmt, history=False, include_unlabeled=False, chunk_size=1000, progress=None):
+    """
+    Return an iterator over the bytes of an export in format ``fmt``.
+
+    Raises ValueError for unknown formats, and for Parquet if pyarrow is not
+    installed, before any rows are read. ``progress``, if given, is called
+    with the number of rows exported so far after each batch.
+    """
+    if fmt not in FORMATS:
+        raise ValueError('Unknown export format: %s' % fmt)
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError('Parquet export requires pyarrow')
+
+    stmt = export_query(history, include_unlabeled)
+    columns = [column.name for column in stmt.selected_columns]
+    rows = batches(stmt, chunk_size)
+    if progress is not None:
+        rows = _counted(rows, progress)
+    if fmt == 'jsonl':
+        return _gzip(_jsonl(rows))
+    if fmt == 'csv':
+        return _gzip(_csv(columns, rows))
+    return _parquet(stmt, rows)
+
+
+def _counted(rows, progress):
+    done = 0
+    for batch in rows:
+        yield batch
+        # The batch has been encoded once the next one is requested
+        done += len(batch)
+        progress(done)
+
+
+def _serialize(value):
+    """Encode datetimes as ISO 8601 strings."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError('Cannot serialize %r' % type(value))
+
+
+def _jsonl(rows):
+    for batch in rows:
+        yield ''.join(json.dumps(row, default=_serialize, ensure_ascii=False) + '\n'
+                      for row in batch).encode('utf-8')
+
+
+def _csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in rows:
+        for row in batch:
+            if 'categories' in row:
+                row['categories'] = CATEGORY_SEPARATOR.join(row['categories'])
+            writer.writerow([row[name].isoformat() if isinstance(row[name], datetime) else row[name]
+                             for name in columns])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _gzip(chunks):
+    """Gzip a stream of byte strings incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _Sink(io.RawIOBase):
+    """A write-only file collecting what pyarrow writes until it is drained."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet(stmt, rows):
+    """Write each batch as a Parquet row group, yielding the file as it grows."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {int: pa.int64(), str: pa.string(), bool: pa.bool_(), datetime: pa.timestamp('us')}
+    schema = pa.schema([
+        (column.name, pa.list_(pa.string()) if column.name == 'categories'
+         else types.get(column.type.python_type, pa.string()))
+        for column in stmt.selected_columns
+    ])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    for batch in rows:
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,351 @@
+"""
+Ticket import for the Ticket Annotation Tool.
+
+This module streams tickets from the gzipped JSON Lines export into the
+database in bounded-memory chunks, using bulk inserts for tickets and their
+category links.
+
+Imports are incremental: an ``ImportManifest`` row records the hash of each
+input file, the offset up to which it has been committed and the hash of
+the file's content up to that offset, and every ticket stores a hash of its
+source record. Re-running an import of an unchanged file does nothing, an
+interrupted import resumes from its last committed chunk, an import of a
+file that has had records appended since, like the nightly export, starts
+after the records already imported, and only new or changed records are
+written.
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import delete, insert, select, update
+from app import cache, db, duplicates, rollup, search
+from app.models import Ticket, Category, ImportManifest
+from app.models.models import ticket_category
+
+CATEGORIES = [
+    'account', 'background checks', 'document assistance',
+    'license and certification', 'shift attendance', 'shift cancellation',
+    'payment', 'technical issues', 'timesheet submission', 'others'
+]
+
+
+class ImportStats:
+    """Counters describing the progress of an import."""
+
+    def __init__(self):
+        self.read = 0
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.resumed_from = 0
+        self.offset = 0
+        self.up_to_date = False
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        """Seconds since the import started."""
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_sec(self):
+        """Input records processed per second."""
+        return self.read / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return '<ImportStats read={} added={} updated={} unchanged={} skipped={} {:.0f} rows/s>'.format(
+            self.read, self.added, self.updated, self.unchanged, self.skipped, self.rows_per_sec)
+
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def prefix_digest(path, size):
+    """
+    Return a SHA-256 hash object of the first ``size`` uncompressed bytes of a gzip file.
+
+    Returns None if the file is shorter or the prefix doesn't end with a
+    complete line, as then records can't be resumed after it.
+    """
+    digest = hashlib.sha256()
+    last = b''
+    with gzip.open(path, 'rb') as f:
+        while size > 0:
+            block = f.read(min(size, 1 << 20))
+            if not block:
+                return None
+            digest.update(block)
+            last = block[-1:]
+            size -= len(block)
+    return digest if last == b'\n' else None
+
+
+def uncompressed_size(path):
+    """
+    Return the uncompressed size of a gzip file as recorded in its trailer.
+
+    The trailer stores the size modulo 2**32, so the value is only exact for
+    files smaller than 4 GiB.
+    """
+    with open(path, 'rb') as f:
+        f.seek(-4, os.SEEK_END)
+        return int.from_bytes(f.read(4), 'little')
+
+
+def iter_records(path, offset=0, digest=None):
+    """
+    Yield ``(end_offset, record)`` pairs from a gzipped JSON Lines file.
+
+    ``end_offset`` is the uncompressed byte offset just past the record's
+    line; passing it back as ``offset`` resumes reading after that record.
+    ``digest``, if given, is updated with each line read, so it covers the
+    file up to ``end_offset`` when a record is yielded. Files holding a
+    single JSON array are also accepted, but are parsed in one go and always
+    read from the start, with an ``end_offset`` of None.
+    """
+    with gzip.open(path, 'rb') as f:
+        if f.read(64).lstrip().startswith(b'['):
+            f.seek(0)
+            for record in json.load(f):
+                yield None, record
+            return
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            if digest is not None:
+                digest.update(line)
+            if line.strip():
+                yield offset, json.loads(line)
+
+
+def ensure_categories():
+    """Create the known categories if they don't exist and return a name to id mapping."""
+    existing = {category.name: category for category in Category.query.all()}
+    for name in CATEGORIES:
+        if name not in existing:
+            existing[name] = Category(name=name)
+            db.session.add(existing[name])
+    db.session.commit()
+    return {name: category.id for name, category in existing.items()}
+
+
+def ticket_row(record):
+    """
+    Map an input record to ``Ticket`` column values.
+
+    Returns None for records that are unlikely to be an in-app issue.
+    """
+    in_app_issue_likelihood = record['IN_APP_ISSUE_LIKELIHOOD']
+    issue_description_not_an_issue = record['NOT_AN_ISSUE']
+
+    likelihood = 'possible'
+    if in_app_issue_likelihood == 4 and not issue_description_not_an_issue:
+        likelihood = 'likely'
+    elif in_app_issue_likelihood < 4 and issue_description_not_an_issue:
+        # unlikely an issue: skip
+        return None
+
+    return {
+        'ticket_id': str(record['TICKET_ID']),
+        'subject': record['SUBJECT'],
+        'summary': record.get('SUMMARY'),
+        'conversation': record.get('CHAT_HISTORY'),
+        'tech_issue_likelihood': likelihood,
+        'issue_description': record.get('ISSUE_DESCRIPTION'),
+        'created_at_zendesk': datetime.strptime(record.get('CREATED_AT_PST'), '%Y-%m-%d')
+    }
+
+
+def content_hash(row, ids):
+    """Hash the imported column values and category ids of a ticket."""
+    payload = json.dumps([row, sorted(ids)], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def category_ids(record, category_map):
+    """Return the ids of the record's known categories, defaulting to 'others'."""
+    ids = set()
+    for name in record.get('REQUEST_CATEGORIES') or []:
+        name = name.strip()
+        if name in category_map:
+            ids.add(category_map[name])
+    return ids or {category_map['others']}
+
+
+def _start_manifest(path, resume):
+    """
+    Return the manifest for ``path``, the offset to start reading at and a hash object of the file up to it.
+
+    Reading resumes at the recorded offset if the file is unchanged or only
+    has content appended after it; otherwise it starts over.
+    """
+    path = os.path.abspath(path)
+    digest = file_hash(path)
+    manifest = ImportManifest.query.filter_by(path=path).first()
+    if manifest and resume and manifest.file_hash == digest:
+        if manifest.status == 'complete':
+            return manifest, manifest.offset, None
+        return manifest, manifest.offset, prefix_digest(path, manifest.offset) or hashlib.sha256()
+
+    if manifest and resume and manifest.offset and manifest.prefix_hash:
+        # Only decompressed, not parsed, to check the records imported before are unchanged
+        prefix = prefix_digest(path, manifest.offset)
+        if prefix is not None and prefix.hexdigest() == manifest.prefix_hash:
+            manifest.file_hash = digest
+            manifest.file_size = os.path.getsize(path)
+            manifest.status = 'running'
+            manifest.started_at = datetime.utcnow()
+            manifest.finished_at = None
+            db.session.commit()
+            return manifest, manifest.offset, prefix
+
+    if manifest is None:
+        manifest = ImportManifest(path=path)
+        db.session.add(manifest)
+    manifest.file_hash = digest
+    manifest.file_size = os.path.getsize(path)
+    manifest.offset = 0
+    manifest.prefix_hash = None
+    manifest.records_read = 0
+    manifest.status = 'running'
+    manifest.started_at = datetime.utcnow()
+    manifest.finished_at = None
+    db.session.commit()
+    return manifest, 0, hashlib.sha256()
+
+
+def _write_chunk(new_rows, changed_rows, links):
+    """
+    Bulk insert new tickets, update changed ones and rewrite their category links.
+
+    Also applies the changes to the daily rollup, the search index and the
+    near-duplicate index and bumps the data version; the caller commits the
+    chunk.
+    """
+    deltas = rollup.Deltas()
+    for row in new_rows:
+        deltas.add(row['created_at_zendesk'], links[row['ticket_id']], 'unlabeled')
+    if changed_rows:
+        # Changed tickets keep their label but may move to another day or category
+        state = rollup.ticket_state([row['id'] for row in changed_rows])
+        for row in changed_rows:
+            created_at, label, category_ids = state.get(row['id'], (None, 'unlabeled', []))
+            deltas.add(created_at, category_ids, label, -1)
+            deltas.add(row['created_at_zendesk'], links[row['ticket_id']], label)
+
+    if new_rows:
+        db.session.execute(insert(Ticket), new_rows)
+    if changed_rows:
+        # Removed from the search index while it can still read their old text
+        search.remove_tickets([row['id'] for row in changed_rows])
+        db.session.execute(update(Ticket), changed_rows)
+        db.session.execute(delete(ticket_category).where(
+            ticket_category.c.ticket_id.in_([row['id'] for row in changed_rows])))
+
+    ticket_pks = db.session.execute(
+        select(Ticket.ticket_id, Ticket.id).where(Ticket.ticket_id.in_(links))
+    ).all()
+    db.session.execute(insert(ticket_category), [
+        {'ticket_id': ticket_pk, 'category_id': category_id}
+        for zendesk_id, ticket_pk in ticket_pks
+        for category_id in links[zendesk_id]
+    ])
+    rollup.apply(deltas)
+
+    pks = dict(ticket_pks)
+    indexed = [dict(row, id=pks[row['ticket_id']]) for row in new_rows] + changed_rows
+    search.index_tickets(indexed)
+    duplicates.remove_tickets([row['id'] for row in changed_rows])
+    duplicates.index_tickets(indexed)
+    cache.bump_data_version()
+
+
+def import_tickets(path, chunk_size=2000, progress=None, resume=True):
+    """
+    Import new and changed tickets from ``path``.
+
+    Records are read in chunks of ``chunk_size``; each chunk is written with
+    bulk inserts and committed together with the manifest offset. If the
+    file was imported before, an unchanged file is skipped, and an
+    interrupted import or a file with records appended since resumes after
+    the records already imported; pass ``resume=False`` to re-read the
+    whole file. ``progress`` is called with the running ``ImportStats`` after
+    every chunk.
+
+    Returns the final ``ImportStats``.
+    """
+    stats = ImportStats()
+    manifest, offset, digest = _start_manifest(path, resume)
+    if manifest.status == 'complete':
+        stats.up_to_date = True
+        return stats
+    stats.resumed_from = stats.offset = offset
+
+    category_map = ensure_categories()
+    known = dict(db.session.execute(select(Ticket.ticket_id, Ticket.content_hash)).all())
+
+    records = iter_records(path, offset, digest)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        stats.read += len(chunk)
+
+        new, changed, links = {}, {}, {}
+        for _, record in chunk:
+            row = ticket_row(record)
+            if row is None:
+                stats.skipped += 1
+                continue
+            ids = category_ids(record, category_map)
+            row['content_hash'] = content_hash(row, ids)
+            zendesk_id = row['ticket_id']
+            if zendesk_id in new or zendesk_id not in known:
+                new[zendesk_id] = row
+            elif known[zendesk_id] != row['content_hash']:
+                changed[zendesk_id] = row
+            else:
+                stats.unchanged += 1
+                continue
+            known[zendesk_id] = row['content_hash']
+            links[zendesk_id] = ids
+
+        new_rows = list(new.values())
+        changed_rows = []
+        if changed:
+            ticket_pks = dict(db.session.execute(
+                select(Ticket.ticket_id, Ticket.id).where(Ticket.ticket_id.in_(changed))
+            ).all())
+            changed_rows = [dict(row, id=ticket_pks[zendesk_id])
+                            for zendesk_id, row in changed.items()]
+
+        if links:
+            _write_chunk(new_rows, changed_rows, links)
+        stats.added += len(new_rows)
+        stats.updated += len(changed_rows)
+
+        end_offset = chunk[-1][0]
+        if end_offset is not None:
+            manifest.offset = stats.offset = end_offset
+            manifest.prefix_hash = digest.hexdigest()
+        manifest.records_read += len(chunk)
+        db.session.commit()
+
+        if progress:
+            progress(stats)
+
+    manifest.status = 'complete'
+    manifest.finished_at = datetime.utcnow()
+    db.session.commit()
+    return stats
@@ -0,0 +1,210 @@
+"""
+Background jobs for the Ticket Annotation Tool.
+
+Long-running work such as imports and exports runs in a local process pool
+instead of inside a request. Job state lives in the ``Job`` table, so any web worker
+can report progress through ``/api/jobs/<id>``; no external broker is
+needed.
+
+Handlers are registered with the ``handler`` decorator and are called as
+``func(params, report)`` inside an application context of the pool
+process. With ``JOB_WORKERS = 0`` jobs instead run to completion inside
+``submit``, in the submitting process, which benchmarks use to measure a
+job like a request. ``report(progress, total=None, rows_per_sec=None)`` records
+progress; the handler's return value becomes the job's message.
+"""
+import json
+import multiprocessing
+import os
+import pickle
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import partial
+from flask import current_app
+from app import db, exporter, importer
+from app.models import Job
+
+HANDLERS = {}
+
+_executor = None
+_worker_app = None
+
+
+def handler(kind):
+    """Register the decorated function as the handler for jobs of ``kind``."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def submit(kind, params=None, user=None):
+    """
+    Create a job of ``kind`` and queue it on the process pool.
+
+    Raises ValueError for unknown job kinds and parameters that are not a
+    dict. Returns the new ``Job``.
+    """
+    if kind not in HANDLERS:
+        raise ValueError('Unknown job kind: %s' % kind)
+    if params is not None and not isinstance(params, dict):
+        raise ValueError('Job params must be an object')
+
+    job = Job(kind=kind, params=json.dumps(params or {}), user_id=user.id if user else None)
+    db.session.add(job)
+    db.session.commit()
+
+    if current_app.config['JOB_WORKERS'] == 0:
+        _execute(job.id)
+        return job
+
+    try:
+        future = _get_executor().submit(_run, job.id)
+    except BrokenProcessPool:
+        _shutdown_executor()
+        future = _get_executor().submit(_run, job.id)
+    future.add_done_callback(partial(_on_done, current_app._get_current_object(), job.id))
+    return job
+
+
+def _get_executor():
+    """Return the process pool of this web worker, creating it on first use."""
+    global _executor
+    if _executor is None:
+        config = {}
+        for key, value in current_app.config.items():
+            try:
+                pickle.dumps(value)
+            except Exception:
+                continue
+            config[key] = value
+        _executor = ProcessPoolExecutor(
+            max_workers=current_app.config['JOB_WORKERS'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(config,)
+        )
+    return _executor
+
+
+def _shutdown_executor():
+    """Discard the process pool, e.g. after one of its processes died."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _on_done(app, job_id, future):
+    """Mark a job as failed if its pool process died before recording an outcome."""
+    error = future.exception() if not future.cancelled() else None
+    if error is None and not future.cancelled():
+        return
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        if job and job.status in ('queued', 'running'):
+            job.status = 'failed'
+            job.error = '%s: %s' % (type(error).__name__, error) if error else 'Cancelled'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+
+def _init_worker(config):
+    """Create the application used by a pool process."""
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app(type('JobConfig', (), config))
+
+
+def _run(job_id):
+    """Execute a job in a pool process."""
+    with _worker_app.app_context():
+        _execute(job_id)
+
+
+def _execute(job_id):
+    """Execute a job in the current application context and record its outcome."""
+    job = db.session.get(Job, job_id)
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+
+    def report(progress, total=None, rows_per_sec=None):
+        job.progress = progress
+        if total is not None:
+            job.total = total
+        if rows_per_sec is not None:
+            job.rows_per_sec = rows_per_sec
+        db.session.commit()
+
+    try:
+        message = HANDLERS[job.kind](json.loads(job.params or '{}'), report)
+    except Exception as e:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = '%s: %s' % (type(e).__name__, e)
+    else:
+        job.status = 'complete'
+        job.message = message
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+@handler('import_tickets')
+def import_tickets(params, report):
+    """Import tickets from the configured TICKETS_JSON_FILE."""
+    path = current_app.config['TICKETS_JSON_FILE']
+    size = importer.uncompressed_size(path)
+    report(0, total=size)
+
+    def progress(stats):
+        report(min(stats.offset, size), rows_per_sec=stats.rows_per_sec)
+
+    result = importer.import_tickets(path, chunk_size=current_app.config['IMPORT_CHUNK_SIZE'],
+                                     progress=progress, resume=not params.get('full'))
+    if result.up_to_date:
+        report(size)
+        return 'JSON file has not changed since the last import.'
+    report(size, rows_per_sec=result.rows_per_sec)
+    return 'Loaded %s new and %s updated tickets (%.0f rows/sec).' % (
+        result.added, result.updated, result.rows_per_sec)
+
+
+@handler('export')
+def export_annotations(params, report):
+    """
+    Export annotations to a new file in EXPORT_DIR.
+
+    ``params`` may set ``format`` ('jsonl', 'csv' or 'parquet'), ``history``
+    and ``include_unlabeled`` as for ``/api/export``.
+    """
+    fmt = params.get('format', 'jsonl')
+    history = bool(params.get('history'))
+    include_unlabeled = bool(params.get('include_unlabeled'))
+    started = time.perf_counter()
+    exported = 0
+
+    def progress(rows):
+        nonlocal exported
+        exported = rows
+        report(rows, rows_per_sec=rows / max(time.perf_counter() - started, 1e-6))
+
+    chunks = exporter.stream(fmt, history, include_unlabeled, chunk_size=5000, progress=progress)
+    report(0, total=exporter.count(history, include_unlabeled))
+
+    directory = current_app.config['EXPORT_DIR']
+    os.makedirs(directory, exist_ok=True)
+    filename = '%s-%s-%s.%s' % ('annotation-history' if history else 'annotations',
+                                datetime.utcnow().strftime('%Y%m%d-%H%M%S'), uuid.uuid4().hex[:8],
+                                exporter.FORMATS[fmt][0])
+    path = os.path.join(directory, filename)
+    # Written under a temporary name, so files in EXPORT_DIR are always complete
+    with open(path + '.part', 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(path + '.part', path)
+    report(exported, total=exported)
+    return 'Exported %d rows to %s.' % (exported, path)
@@ -0,0 +1,209 @@
+"""
+Ticket label state for the Ticket Annotation Tool.
+
+Each ticket stores its current label ('unlabeled', 'positive' or
+'negative'), the id of its latest annotation and its annotation count, so
+status filters are indexed equality lookups. This module keeps that state
+in step with the ``Annotation`` table.
+"""
+from datetime import datetime
+from sqlalchemy import bindparam, func, insert, or_, select, update
+from app import cache, db, events, leases, rollup
+from app.models import Ticket, Annotation
+from app.models.models import latest_annotations, annotation_label
+
+# Error for an idempotency key submitted again with another ticket or verdict
+REUSED_KEY_MESSAGE = 'idempotency_key was already used for a different annotation'
+
+
+def label_for(is_app_issue):
+    """Return the label corresponding to an annotation verdict."""
+    return 'positive' if is_app_issue else 'negative'
+
+
+def record_annotation(ticket, user, is_app_issue, rationale=''):
+    """
+    Add an annotation for ``ticket`` and update the ticket's label state.
+
+    The annotation, the label state, the daily rollup, the label events for
+    live dashboards, the annotator's lease and the data version bump are all
+    changed in the current session; the caller commits them together.
+    """
+    annotation = Annotation(
+        ticket_id=ticket.id,
+        user_id=user.id,
+        is_app_issue=is_app_issue,
+        rationale=rationale
+    )
+    db.session.add(annotation)
+    db.session.flush()
+
+    created_at, old_label, category_ids = rollup.ticket_state([ticket.id]).get(
+        ticket.id, (None, ticket.current_label, []))
+    deltas = rollup.Deltas()
+    deltas.relabel(created_at, category_ids, old_label, label_for(is_app_issue))
+    rollup.apply(deltas)
+    events.record([(ticket.id, created_at, category_ids, old_label, label_for(is_app_issue))])
+
+    ticket.current_label = label_for(is_app_issue)
+    ticket.latest_annotation_id = annotation.id
+    ticket.annotation_count = Ticket.annotation_count + 1
+    leases.release(user, [ticket.id])
+    cache.bump_data_version()
+    return annotation
+
+
+def _batch_item_error(item):
+    """Return why a batch item is invalid, or None if it is well formed."""
+    if not isinstance(item, dict):
+        return 'Item must be an object'
+    if item.get('ticket_id') is None or item.get('is_app_issue') is None:
+        return 'Missing required fields'
+    if not isinstance(item['ticket_id'], int) or isinstance(item['ticket_id'], bool):
+        return 'ticket_id must be an integer'
+    if not isinstance(item['is_app_issue'], bool):
+        return 'is_app_issue must be true or false'
+    key = item.get('idempotency_key')
+    if key is not None and (not isinstance(key, str) or not 0 < len(key) <= 64):
+        return 'idempotency_key must be a string of 1 to 64 characters'
+    return None
+
+
+def record_annotations(user, items):
+    """
+    Add a batch of annotations by ``user`` and update the tickets' label state.
+
+    ``items`` are dicts with ``ticket_id``, ``is_app_issue`` and optional
+    ``rationale`` and ``idempotency_key``. Valid items are inserted with a
+    single bulk insert; an item whose idempotency key the user has already
+    submitted is not inserted again, and is an error if its ticket or
+    verdict differ from the first submission. When a batch annotates a
+    ticket more than once its last item sets the label. Returns one result
+    dict per item, in order, with a ``status`` of 'created', 'duplicate' or
+    'error'. The caller commits.
+    """
+    results = [{'index': index, 'ticket_id': item.get('ticket_id') if isinstance(item, dict) else None}
+               for index, item in enumerate(items)]
+    valid = []
+    for result, item in zip(results, items):
+        error = _batch_item_error(item)
+        if error:
+            result.update(status='error', message=error)
+        else:
+            valid.append((result, item))
+
+    keys = {item['idempotency_key'] for _, item in valid if item.get('idempotency_key')}
+    existing = {key: (annotation_id, (ticket_id, is_app_issue))
+                for key, annotation_id, ticket_id, is_app_issue in db.session.execute(
+                    select(Annotation.idempotency_key, Annotation.id, Annotation.ticket_id,
+                           Annotation.is_app_issue)
+                    .where(Annotation.user_id == user.id, Annotation.idempotency_key.in_(keys)))} if keys else {}
+    tickets = set(db.session.execute(
+        select(Ticket.id).where(Ticket.id.in_({item['ticket_id'] for _, item in valid}))
+    ).scalars()) if valid else set()
+
+    pending, seen_keys = [], {}
+    for result, item in valid:
+        key = item.get('idempotency_key')
+        payload = (item['ticket_id'], item['is_app_issue'])
+        if key in existing:
+            annotation_id, saved = existing[key]
+            if payload != saved:
+                result.update(status='error', message=REUSED_KEY_MESSAGE)
+            else:
+                result.update(status='duplicate', annotation_id=annotation_id)
+        elif key in seen_keys:
+            if payload != seen_keys[key][0]:
+                result.update(status='error', message=REUSED_KEY_MESSAGE)
+            else:
+                # Resolved to the first item's annotation once it is inserted
+                seen_keys[key][1].append(result)
+        elif item['ticket_id'] not in tickets:
+            result.update(status='error', message='Ticket not found')
+        else:
+            pending.append((result, item))
+            if key:
+                seen_keys[key] = (payload, [])
+    if not pending:
+        return results
+
+    now = datetime.utcnow()
+    # A plain executemany; asking for the ids with ordered RETURNING makes
+    # SQLAlchemy send one INSERT per row on SQLite. The rows are read back
+    # instead: their timestamp is shared by this batch's rows only, and ids
+    # increase in insert order.
+    db.session.execute(insert(Annotation.__table__), [
+        {'ticket_id': item['ticket_id'], 'user_id': user.id, 'is_app_issue': item['is_app_issue'],
+         'rationale': item.get('rationale') or '', 'idempotency_key': item.get('idempotency_key'),
+         'created_at': now} for _, item in pending
+    ])
+    annotation_ids = db.session.execute(
+        select(Annotation.id)
+        .where(Annotation.user_id == user.id, Annotation.created_at == now)
+        .order_by(Annotation.id)
+    ).scalars().all()
+
+    latest = {}
+    for (result, item), annotation_id in zip(pending, annotation_ids):
+        result.update(status='created', annotation_id=annotation_id)
+        for duplicate in seen_keys.get(item.get('idempotency_key'), (None, ()))[1]:
+            duplicate.update(status='duplicate', annotation_id=annotation_id)
+        label, _, added = latest.get(item['ticket_id'], (None, None, 0))
+        latest[item['ticket_id']] = (label_for(item['is_app_issue']), annotation_id, added + 1)
+
+    deltas, changes = rollup.Deltas(), []
+    for ticket_id, (created_at, old_label, category_ids) in rollup.ticket_state(list(latest)).items():
+        deltas.relabel(created_at, category_ids, old_label, latest[ticket_id][0])
+        changes.append((ticket_id, created_at, category_ids, old_label, latest[ticket_id][0]))
+    rollup.apply(deltas)
+    events.record(changes)
+
+    table = Ticket.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.id == bindparam('b_id'))
+        .values(current_label=bindparam('b_label'),
+                latest_annotation_id=bindparam('b_annotation_id'),
+                annotation_count=table.c.annotation_count + bindparam('b_added')),
+        [{'b_id': ticket_id, 'b_label': label, 'b_annotation_id': annotation_id, 'b_added': added}
+         for ticket_id, (label, annotation_id, added) in latest.items()]
+    )
+    leases.release(user, list(latest))
+    cache.bump_data_version()
+    return results
+
+
+def repair_label_state(chunk_size=10000):
+    """
+    Recompute the label state of every ticket from the ``Annotation`` table.
+
+    Only tickets whose stored state differs from the annotations are
+    written, and the daily rollup is rebuilt if any were. Returns the number
+    of tickets updated.
+    """
+    latest = latest_annotations()
+    counts = (select(Annotation.ticket_id, func.count().label('annotation_count'))
+              .group_by(Annotation.ticket_id)
+              .subquery())
+    label = annotation_label(latest)
+    annotation_count = func.coalesce(counts.c.annotation_count, 0)
+
+    stmt = (select(Ticket.id, label, latest.c.annotation_id, annotation_count)
+            .outerjoin(latest, latest.c.ticket_id == Ticket.id)
+            .outerjoin(counts, counts.c.ticket_id == Ticket.id)
+            .where(or_(Ticket.current_label.is_distinct_from(label),
+                       Ticket.latest_annotation_id.is_distinct_from(latest.c.annotation_id),
+                       Ticket.annotation_count.is_distinct_from(annotation_count))))
+
+    changes = [{'id': ticket_id, 'current_label': ticket_label,
+                'latest_annotation_id': annotation_id, 'annotation_count': count}
+               for ticket_id, ticket_label, annotation_id, count in db.session.execute(stmt)]
+
+    for start in range(0, len(changes), chunk_size):
+        db.session.execute(update(Ticket), changes[start:start + chunk_size])
+    if changes:
+        cache.bump_data_version()
+    db.session.commit()
+    if changes:
+        rollup.rebuild()
+    return len(changes)
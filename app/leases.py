@@ -0,0 +1,72 @@
+"""
+Ticket leasing for the Ticket Annotation Tool.
+
+Annotators working the same unlabeled queue would otherwise all be shown
+the same tickets. Instead each annotator claims the tickets they are shown
+in the ``ticket_lease`` table for ``LEASE_SECONDS``; while a lease is live
+the ticket is skipped in everyone else's queue. A claim is a single
+``INSERT ... SELECT ... ON CONFLICT DO UPDATE ... RETURNING`` statement, so
+choosing free tickets and taking them happens atomically and two annotators
+can never hold the same ticket. Expired leases are taken over in place and
+a lease is released when its holder annotates the ticket.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, literal, or_, select
+from sqlalchemy.dialects.sqlite import insert
+from app import db, queue
+from app.models import Ticket, TicketLease
+
+
+def claim(user, limit=1, category_id='all', status='unlabeled', q=None, after_id=0, seconds=None):
+    """
+    Lease up to ``limit`` queue tickets following ``after_id`` to ``user``.
+
+    Tickets leased to other annotators are skipped; tickets already leased
+    to ``user`` are claimed again with a fresh expiry. Returns the ids of
+    the claimed tickets in queue order. ``limit`` is clamped to between 1
+    and ``TICKET_BATCH_MAX``, as SQLite reads a negative limit as no limit.
+    The caller commits.
+    """
+    limit = max(1, min(limit, current_app.config['TICKET_BATCH_MAX']))
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=seconds or current_app.config['LEASE_SECONDS'])
+    held_by_others = (select(TicketLease.ticket_id)
+                      .where(TicketLease.ticket_id == Ticket.id,
+                             TicketLease.expires_at > now,
+                             TicketLease.user_id != user.id)
+                      .exists())
+    candidates = (queue.queue_ids(category_id, status, q)
+                  .add_columns(literal(user.id), literal(now, db.DateTime), literal(expires, db.DateTime))
+                  .where(Ticket.id > after_id, ~held_by_others)
+                  .order_by(Ticket.id)
+                  .limit(limit))
+    stmt = insert(TicketLease).from_select(['ticket_id', 'user_id', 'claimed_at', 'expires_at'], candidates)
+    # Existing leases are only taken over once expired or when already held
+    # by ``user``, so another annotator's live lease is never overwritten
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TicketLease.ticket_id],
+        set_={'user_id': stmt.excluded.user_id,
+              'claimed_at': stmt.excluded.claimed_at,
+              'expires_at': stmt.excluded.expires_at},
+        where=or_(TicketLease.expires_at <= now, TicketLease.user_id == user.id)
+    ).returning(TicketLease.ticket_id)
+    return sorted(db.session.execute(stmt).scalars())
+
+
+def release(user, ticket_ids):
+    """Release ``user``'s leases on ``ticket_ids``. The caller commits."""
+    if ticket_ids:
+        db.session.execute(delete(TicketLease).where(TicketLease.user_id == user.id,
+                                                     TicketLease.ticket_id.in_(ticket_ids)))
+
+
+def held_by_others(user, ticket_ids):
+    """Return the ids among ``ticket_ids`` with a live lease held by an annotator other than ``user``."""
+    if not ticket_ids:
+        return set()
+    return set(db.session.execute(
+        select(TicketLease.ticket_id).where(TicketLease.ticket_id.in_(ticket_ids),
+                                            TicketLease.expires_at > datetime.utcnow(),
+                                            TicketLease.user_id != user.id)
+    ).scalars())
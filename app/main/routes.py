@@ -6,20 +6,21 @@ including the dashboard, annotation interface, and data loading.
 """
 # Standard library imports
 import os
+import gzip
+import hashlib
 import json
 from datetime import datetime, timedelta
 
 # Third-party imports
-import pandas as pd
-import plotly
-import plotly.express as px
-from flask import render_template, redirect, url_for, request, jsonify, current_app, flash
+from flask import render_template, redirect, url_for, request, jsonify, current_app, flash, Response, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload, undefer_group
 
 # Local application imports
-from app import db
+from app import analytics, cache, database, db, duplicates, events, exporter, jobs, labels, leases, queue, search, stats
 from app.main import bp
-from app.models import Ticket, Category, Annotation, User
+from app.models import Ticket, Category, Annotation, User, Job
 
 @bp.route('/')
 def index():
@@ -28,11 +29,8 @@ def index():
         return redirect(url_for('main.dashboard'))
     return render_template('main/index.html')
 
-@bp.route('/dashboard')
-@login_required
-def dashboard():
-    """Dashboard page with summary statistics and filtering"""
-
+def _dashboard_filters():
+    """Return the dashboard's start date, end date and category filters from the query string."""
     # Default date range for filtering
     default_start_date = datetime(2025, 4, 1)  # fixed or (datetime.now() - timedelta(days=30))
     default_end_date = datetime(2025, 4, 30)  # fixed or datetime.now()
@@ -41,6 +39,13 @@ def dashboard():
     start_date = request.args.get('start_date', default_start_date.strftime('%Y-%m-%d'))
     end_date = request.args.get('end_date', default_end_date.strftime('%Y-%m-%d'))
     category_id = request.args.get('category_id', 'all')
+    return start_date, end_date, category_id
+
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    """Dashboard page with summary statistics and filtering"""
+    start_date, end_date, category_id = _dashboard_filters()
     
     # Convert to datetime objects
     start_date_obj = datetime.strptime(start_date, '%Y-%m-%d')
@@ -49,82 +54,161 @@ def dashboard():
     # Get all categories for the filter dropdown
     categories = Category.query.all()
     
-    # Prepare data for the summary table
-    summary_data = []
-    chart_data = []
-    
-    for category in categories:
-        # Base query for this category
-        category_tickets = Ticket.query.filter(Ticket.categories.contains(category))
-        
-        # Apply date filter if tickets have created_at within range
-        if category_id == 'all' or int(category_id) == category.id:
-            # Count unlabeled tickets
-            unlabeled_count = category_tickets.filter(~Ticket.annotations.any()).count()
-            
-            # Count positive annotations (is_app_issue = True)
-            positive_count = db.session.query(Ticket).join(Annotation).filter(
-                Ticket.categories.contains(category),
-                Annotation.is_app_issue == True
-            ).group_by(Ticket.id).count()
-            
-            # Count negative annotations (is_app_issue = False)
-            negative_count = db.session.query(Ticket).join(Annotation).filter(
-                Ticket.categories.contains(category),
-                Annotation.is_app_issue == False
-            ).group_by(Ticket.id).count()
-            
-            # Add to summary data
-            summary_data.append({
-                'category': category.name,
-                'category_id': category.id,
-                'unlabeled': unlabeled_count,
-                'positive': positive_count,
-                'negative': negative_count,
-                'total': unlabeled_count + positive_count + negative_count
-            })
-
-            for ticket_data in category_tickets:
-                # Get the most recent annotation for this ticket (if any)
-                latest_annotation = ticket_data.get_latest_annotation()
-                
-                # Use the annotation data if it exists, otherwise set is_app_issue to None
-                is_app_issue = 'unlabeled'
-                if latest_annotation:
-                    if latest_annotation.is_app_issue:
-                        is_app_issue = 'positive'
-                    else:
-                        is_app_issue = 'negative'
-                
-                chart_data.append({
-                    'date': ticket_data.created_at_zendesk.strftime('%Y-%m-%d'),
-                    'category': category.name,
-                    'is_app_issue': is_app_issue
-                })
-    
-    # Create Plotly chart
-    if chart_data:
-        df = pd.DataFrame(chart_data)
-        #df.to_csv('chart_json.csv')
-        # Group by date and category, count issues
-        #df_grouped = df[df['is_app_issue'] == True].groupby(['date', 'category']).size().reset_index(name='count')
-        df_grouped = df.groupby(['date', 'category']).size().reset_index(name='count')
-        
-        fig = px.line(df_grouped, x='date', y='count', color='category',
-                      title='Daily App Issues by Category')
-        #fig.write_image("chart_json.png")
-
-        chart_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    else:
-        chart_json = None
-    
+    # Read the latest label event, the data version and the summary in one
+    # snapshot, so live updates resume exactly after the changes the summary
+    # already includes
+    database.begin_read(db.session)
+    last_event_id = events.last_id()
+    
+    # Serve the summary from the cache unless the data has changed
+    version = cache.data_version()
+    key = (start_date, end_date, category_id)
+    summary_data = cache.dashboard_cache().get(key, version)
+    if summary_data is None:
+        # Summary table counts for all categories in a single grouped query
+        summary_data = stats.summary_table(categories, start_date_obj, end_date_obj, category_id)
+        cache.dashboard_cache().set(key, version, summary_data)
+    
+    # The chart is drawn in the browser from /api/dashboard/series
     return render_template('main/dashboard.html', 
                           summary_data=summary_data,
                           categories=categories,
                           selected_category=category_id,
                           start_date=start_date,
                           end_date=end_date,
-                          chart_json=chart_json)
+                          series_url=url_for('main.dashboard_series', start_date=start_date,
+                                             end_date=end_date, category_id=category_id),
+                          events_url=url_for('main.dashboard_events', after=last_event_id),
+                          job_id=request.args.get('job_id', type=int))
+
+@bp.route('/api/stats/daily')
+@login_required
+def daily_stats():
+    """
+    API endpoint for the daily ticket counts per category and label.
+    
+    Accepts the dashboard's ``start_date``, ``end_date`` and ``category_id``
+    filters and reads the daily rollup, so its cost depends on the number of
+    days in the range rather than the number of tickets.
+    """
+    start_date, end_date, category_id = _dashboard_filters()
+    try:
+        start_date_obj = datetime.strptime(start_date, '%Y-%m-%d')
+        end_date_obj = datetime.strptime(end_date, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be formatted as YYYY-MM-DD'}), 400
+    
+    return jsonify({
+        'success': True,
+        'rows': stats.daily_rows(start_date_obj, end_date_obj, category_id)
+    })
+
+@bp.route('/api/dashboard/series')
+@login_required
+def dashboard_series():
+    """
+    API endpoint for the dashboard chart's daily series as columnar arrays.
+    
+    Returns the sorted dates and, per category, the daily ``metric``
+    ('count', 'unlabeled', 'positive' or 'negative') for the dashboard
+    filters, and ``last_event_id``, the latest label event the series
+    includes. Responses carry an ETag derived from the data version, so
+    unchanged data is answered with 304 Not Modified, and are gzipped for
+    clients that accept it.
+    """
+    start_date, end_date, category_id = _dashboard_filters()
+    metric = request.args.get('metric', 'count')
+    if metric not in stats.LABELS + ('count',):
+        return jsonify({'success': False, 'message': 'Unknown metric: %s' % metric}), 400
+    try:
+        start_date_obj = datetime.strptime(start_date, '%Y-%m-%d')
+        end_date_obj = datetime.strptime(end_date, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be formatted as YYYY-MM-DD'}), 400
+    
+    database.begin_read(db.session)
+    version = cache.data_version()
+    key = ('series', start_date, end_date, category_id, metric)
+    etag = hashlib.sha1(repr((version,) + key).encode('utf-8')).hexdigest()
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    
+    bodies = cache.dashboard_cache().get(key, version)
+    if bodies is None:
+        last_event_id = events.last_id()
+        columns = stats.daily_columns(start_date_obj, end_date_obj, category_id, metric)
+        body = json.dumps(dict(columns, success=True, last_event_id=last_event_id),
+                          separators=(',', ':')).encode('utf-8')
+        bodies = (body, gzip.compress(body))
+        cache.dashboard_cache().set(key, version, bodies)
+    
+    response = current_app.response_class(mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if 'gzip' in request.accept_encodings:
+        response.set_data(bodies[1])
+        response.content_encoding = 'gzip'
+    else:
+        response.set_data(bodies[0])
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/api/dashboard/events')
+@login_required
+def dashboard_events():
+    """
+    API endpoint streaming label changes to open dashboards as server-sent events.
+    
+    Browsers reconnecting a closed stream resume after their ``Last-Event-ID``
+    header; a new stream starts after the ``after`` query parameter, the
+    latest label event when the dashboard was rendered.
+    """
+    after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        after = request.args.get('after', type=int)
+        if after is None:
+            return jsonify({'success': False, 'message': 'Missing after parameter'}), 400
+        events.prune()
+    
+    return Response(stream_with_context(events.stream(after)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/api/dashboard/cache')
+@login_required
+def dashboard_cache_stats():
+    """API endpoint reporting the size and hit and miss counters of this worker's dashboard cache."""
+    return jsonify({'success': True, 'cache': cache.dashboard_cache().stats()})
+
+def _annotation_report():
+    """Return the annotation analytics report, computed once per data version."""
+    database.begin_read(db.session)
+    version = cache.data_version()
+    report = cache.dashboard_cache().get(('reports',), version)
+    if report is None:
+        report = analytics.report()
+        cache.dashboard_cache().set(('reports',), version, report)
+    return report
+
+@bp.route('/reports')
+@login_required
+def reports():
+    """Reports on annotator agreement, throughput and flipped verdicts"""
+    return render_template('main/reports.html', report=_annotation_report())
+
+@bp.route('/api/reports')
+@login_required
+def reports_data():
+    """
+    API endpoint for the annotation reports shown on the reports page.
+    
+    Returns ``annotations``, the size of the annotation history, and the
+    ``agreement``, ``throughput`` and ``flips`` reports described in
+    ``app.analytics``.
+    """
+    return jsonify({'success': True, 'report': _annotation_report()})
 
 @bp.route('/annotate')
 @login_required
@@ -138,41 +222,36 @@ def annotate():
     # Get filter parameters
     category_id = request.args.get('category_id', 'all')
     status = request.args.get('status', 'unlabeled')  # unlabeled, positive, negative
+    q = request.args.get('q', '')  # full-text search
     
-    # Build query based on filters
-    query = Ticket.query
-    
-    # Filter by category if specified
-    if category_id != 'all':
-        category = Category.query.get(int(category_id))
-        if category:
-            query = query.filter(Ticket.categories.contains(category))
-    
-    # Filter by annotation status
-    if status == 'unlabeled':
-        query = query.filter(~Ticket.annotations.any())
-    elif status == 'positive':
-        query = query.join(Annotation).filter(Annotation.is_app_issue == True)
-    elif status == 'negative':
-        query = query.join(Annotation).filter(Annotation.is_app_issue == False)
-    
-    # Get the ticket ID from the request, or get the first ticket from the query
+    # Get the ticket ID from the request, or get the first ticket in the queue
     ticket_id = request.args.get('ticket_id')
     
     if ticket_id:
-        ticket = Ticket.query.get(int(ticket_id))
+        ticket = db.session.get(Ticket, int(ticket_id), options=[undefer_group('text')])
         if not ticket:
             flash('Ticket not found.', 'error')
             return redirect(url_for('main.dashboard'))
+    elif status == 'unlabeled':
+        # Lease the first free ticket so that concurrent annotators are
+        # shown different tickets
+        claimed = leases.claim(current_user, 1, category_id, status, q)
+        db.session.commit()
+        if not claimed:
+            flash('No tickets found matching the criteria.' if queue.first_id(category_id, status, q) is None
+                  else 'All matching tickets are being annotated by others; try again later.', 'error')
+            return redirect(url_for('main.dashboard'))
+        ticket = db.session.get(Ticket, claimed[0], options=[undefer_group('text')])
     else:
-        ticket = query.first()
-        if not ticket:
+        first_id = queue.first_id(category_id, status, q)
+        if first_id is None:
             flash('No tickets found matching the criteria.', 'error')
             return redirect(url_for('main.dashboard'))
+        ticket = db.session.get(Ticket, first_id, options=[undefer_group('text')])
     
     # Get total count and current position
-    total_count = query.count()
-    current_position = list(query.all()).index(ticket) + 1 if ticket in query.all() else 1
+    total_count = queue.total(category_id, status, q)
+    current_position = queue.position(ticket.id, category_id, status, q)
     
     # Get the latest annotation for this ticket if it exists
     latest_annotation = ticket.get_latest_annotation()
@@ -183,7 +262,9 @@ def annotate():
                           total_count=total_count,
                           category_id=category_id,
                           status=status,
-                          latest_annotation=latest_annotation)
+                          q=q,
+                          latest_annotation=latest_annotation,
+                          batch_size=current_app.config['TICKET_BATCH_SIZE'])
 
 @bp.route('/api/annotate', methods=['POST'])
 @login_required
@@ -201,177 +282,343 @@ def submit_annotation():
     
     if ticket_id is None or is_app_issue is None:
         return jsonify({'success': False, 'message': 'Missing required fields'}), 400
+    if not isinstance(is_app_issue, bool):
+        return jsonify({'success': False, 'message': 'is_app_issue must be true or false'}), 400
     
     # Get the ticket
     ticket = Ticket.query.get(int(ticket_id))
     if not ticket:
         return jsonify({'success': False, 'message': 'Ticket not found'}), 404
     
-    # Create new annotation
-    annotation = Annotation(
-        ticket_id=ticket.id,
-        user_id=current_user.id,
-        is_app_issue=is_app_issue,
-        rationale=rationale
-    )
-    
-    db.session.add(annotation)
+    # Create new annotation and update the ticket's label state
+    labels.record_annotation(ticket, current_user, is_app_issue, rationale)
     db.session.commit()
     
     return jsonify({'success': True, 'message': 'Annotation submitted successfully'})
 
+@bp.route('/api/annotations/batch', methods=['POST'])
+@login_required
+def submit_annotation_batch():
+    """
+    API endpoint for submitting many annotations at once.
+    
+    Receives a JSON object whose ``annotations`` list holds items shaped like
+    ``/api/annotate`` requests, each with an optional ``idempotency_key``.
+    Valid items are saved in one transaction and the response reports the
+    outcome of every item, so a client can retry a failed request with the
+    same keys without creating duplicate annotations.
+    """
+    items = (request.json or {}).get('annotations')
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': 'Missing annotations'}), 400
+    if len(items) > current_app.config['ANNOTATION_BATCH_MAX']:
+        return jsonify({'success': False, 'message': 'At most %d annotations per batch'
+                        % current_app.config['ANNOTATION_BATCH_MAX']}), 400
+    
+    try:
+        results = labels.record_annotations(current_user, items)
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent retry saved one of the idempotency keys first; a second
+        # pass reports those items as duplicates
+        db.session.rollback()
+        results = labels.record_annotations(current_user, items)
+        db.session.commit()
+    
+    counts = {status: sum(result['status'] == status for result in results)
+              for status in ('created', 'duplicate', 'error')}
+    return jsonify({'success': True, 'counts': counts, 'results': results})
+
+def _neighbour_ticket(find_id):
+    """Return the JSON redirect to the queue neighbour selected by ``find_id``."""
+    current_ticket_id = request.args.get('current_ticket_id', type=int)
+    category_id = request.args.get('category_id', 'all')
+    status = request.args.get('status', 'unlabeled')
+    q = request.args.get('q', '')
+    
+    ticket_id = find_id(current_ticket_id, category_id, status, q)
+    if ticket_id is None:
+        return jsonify({'success': False, 'message': 'No tickets found matching the criteria'})
+    
+    # Redirect to the annotation page with the neighbouring ticket
+    return jsonify({
+        'success': True,
+        'redirect': url_for('main.annotate', 
+                           ticket_id=ticket_id,
+                           category_id=category_id,
+                           status=status,
+                           q=q or None)
+    })
+
 @bp.route('/api/next_ticket')
 @login_required
 def next_ticket():
     """
     API endpoint for getting the next ticket.
     
-    Returns the next ticket in the sequence based on filter criteria.
+    Returns the next ticket in the sequence based on filter criteria, wrapping
+    around to the first ticket at the end of the queue.
+    """
+    return _neighbour_ticket(queue.next_id)
+
+@bp.route('/api/prev_ticket')
+@login_required
+def prev_ticket():
+    """
+    API endpoint for getting the previous ticket.
+    
+    Returns the previous ticket in the sequence based on filter criteria,
+    wrapping around to the last ticket at the start of the queue.
     """
-    current_ticket_id = request.args.get('current_ticket_id')
+    return _neighbour_ticket(queue.prev_id)
+
+def _ticket_to_dict(ticket):
+    """Serialize a ticket with the fields shown on the annotation page."""
+    latest = ticket.latest_annotation
+    return {
+        'id': ticket.id,
+        'ticket_id': ticket.ticket_id,
+        'subject': ticket.subject,
+        'summary': ticket.summary,
+        'conversation': ticket.conversation,
+        'issue_description': ticket.issue_description,
+        'tech_issue_likelihood': ticket.tech_issue_likelihood,
+        'categories': [category.name for category in ticket.categories],
+        'latest_annotation': {
+            'is_app_issue': latest.is_app_issue,
+            'annotator': latest.annotator.email,
+            'created_at': latest.created_at.strftime('%Y-%m-%d %H:%M'),
+            'rationale': latest.rationale
+        } if latest else None
+    }
+
+def _limit_arg(default):
+    """Return the ``limit`` query parameter, clamped to between 1 and ``TICKET_BATCH_MAX``."""
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, current_app.config['TICKET_BATCH_MAX']))
+
+@bp.route('/api/tickets')
+@login_required
+def ticket_batch():
+    """
+    API endpoint for fetching a batch of tickets from the annotation queue.
+    
+    Returns up to ``limit`` tickets following ``after`` for the category,
+    status and search filters, with everything the annotation page displays, so the page
+    can buffer tickets and advance without further requests. Unlabeled
+    tickets are leased to the current user, skipping those leased to others.
+    """
+    after = request.args.get('after', 0, type=int)
+    limit = _limit_arg(20)
     category_id = request.args.get('category_id', 'all')
     status = request.args.get('status', 'unlabeled')
+    q = request.args.get('q', '')
     
-    # Build query based on filters
-    query = Ticket.query
+    if status == 'unlabeled':
+        ids = leases.claim(current_user, limit, category_id, status, q, after_id=after)
+        db.session.commit()
+    else:
+        ids = queue.next_ids(after, limit, category_id, status, q)
+    tickets = Ticket.query.filter(Ticket.id.in_(ids)).options(
+        undefer_group('text'),
+        selectinload(Ticket.categories),
+        selectinload(Ticket.latest_annotation).joinedload(Annotation.annotator)
+    ).order_by(Ticket.id).all() if ids else []
     
-    # Filter by category if specified
-    if category_id != 'all':
-        category = Category.query.get(int(category_id))
-        if category:
-            query = query.filter(Ticket.categories.contains(category))
+    return jsonify({
+        'success': True,
+        'tickets': [_ticket_to_dict(ticket) for ticket in tickets],
+        'total': queue.total(category_id, status, q)
+    })
+
+@bp.route('/api/search')
+@login_required
+def search_tickets():
+    """
+    API endpoint for ranked full-text search over ticket content.
     
-    # Filter by annotation status
-    if status == 'unlabeled':
-        query = query.filter(~Ticket.annotations.any())
-    elif status == 'positive':
-        query = query.join(Annotation).filter(Annotation.is_app_issue == True)
-    elif status == 'negative':
-        query = query.join(Annotation).filter(Annotation.is_app_issue == False)
+    Returns up to ``limit`` tickets matching every word of ``q``, best match
+    first, with a highlighted snippet. The optional ``category_id`` and
+    ``status`` filters restrict the results to an annotation queue.
+    """
+    q = request.args.get('q', '')
+    limit = _limit_arg(20)
+    category_id = request.args.get('category_id', 'all')
+    status = request.args.get('status', 'all')
     
-    # Order by ID to ensure consistent ordering
-    query = query.order_by(Ticket.id)
+    if search.match_query(q) is None:
+        return jsonify({'success': False, 'message': 'Search query must contain a word'}), 400
     
-    # Get all tickets matching the criteria
-    tickets = query.all()
+    candidates = queue.queue_ids(category_id, status) if (category_id, status) != ('all', 'all') else None
+    matches = search.search(q, limit, candidates)
+    tickets = {ticket.id: ticket for ticket in Ticket.query.filter(
+        Ticket.id.in_([ticket_id for ticket_id, _, _ in matches])).all()} if matches else {}
     
-    if not tickets:
-        return jsonify({'success': False, 'message': 'No tickets found matching the criteria'})
+    return jsonify({
+        'success': True,
+        'results': [{
+            'id': ticket_id,
+            'ticket_id': tickets[ticket_id].ticket_id,
+            'subject': tickets[ticket_id].subject,
+            'current_label': tickets[ticket_id].current_label,
+            'score': score,
+            'snippet': snippet,
+            'url': url_for('main.annotate', ticket_id=ticket_id, category_id=category_id,
+                           status=status, q=q)
+        } for ticket_id, score, snippet in matches if ticket_id in tickets]
+    })
+
+@bp.route('/api/tickets/<int:ticket_id>/duplicates')
+@login_required
+def ticket_duplicates(ticket_id):
+    """
+    API endpoint for the near-duplicates of a ticket.
     
-    # Find the current ticket in the list
-    current_index = -1
-    if current_ticket_id:
-        for i, ticket in enumerate(tickets):
-            if ticket.id == int(current_ticket_id):
-                current_index = i
-                break
-    
-    # Get the next ticket
-    if current_index >= 0 and current_index < len(tickets) - 1:
-        next_ticket = tickets[current_index + 1]
-    else:
-        # If current ticket not found or it's the last one, return the first ticket
-        next_ticket = tickets[0]
+    Returns the ticket's cluster id and size and up to ``limit`` other
+    members of its cluster, most similar first, with the text annotators
+    review before labeling them together. ``cluster_id`` is null for
+    tickets without near-duplicates.
+    """
+    limit = _limit_arg(50)
+    if Ticket.query.get(ticket_id) is None:
+        return jsonify({'success': False, 'message': 'Ticket not found'}), 404
     
-    # Redirect to the annotation page with the next ticket
+    cluster_id, size, members = duplicates.near_duplicates(ticket_id, limit)
+    tickets = {ticket.id: ticket for ticket in Ticket.query.filter(
+        Ticket.id.in_([member_id for member_id, _ in members])
+    ).options(undefer_group('text')).all()} if members else {}
     return jsonify({
         'success': True,
-        'redirect': url_for('main.annotate', 
-                           ticket_id=next_ticket.id,
-                           category_id=category_id,
-                           status=status)
+        'ticket_id': ticket_id,
+        'cluster_id': cluster_id,
+        'size': size,
+        'duplicates': [{
+            'id': member_id,
+            'ticket_id': tickets[member_id].ticket_id,
+            'subject': tickets[member_id].subject,
+            'summary': tickets[member_id].summary,
+            'issue_description': tickets[member_id].issue_description,
+            'current_label': tickets[member_id].current_label,
+            'similarity': round(score, 3)
+        } for member_id, score in members if member_id in tickets]
     })
 
+@bp.route('/api/clusters/<int:cluster_id>/annotate', methods=['POST'])
+@login_required
+def annotate_cluster(cluster_id):
+    """
+    API endpoint applying one verdict to reviewed tickets of a near-duplicate cluster.
+    
+    Receives ``ticket_ids``, the cluster members the annotator reviewed,
+    ``is_app_issue`` and an optional ``rationale``, and annotates them in one
+    transaction. Tickets another annotator holds a live lease on are skipped
+    and returned as ``skipped``, so their verdict is left to that annotator.
+    Fails without saving anything if a ticket is not in the cluster, e.g.
+    because the cluster changed since it was shown.
+    """
+    data = request.json or {}
+    ticket_ids = data.get('ticket_ids')
+    is_app_issue = data.get('is_app_issue')
+    
+    if not isinstance(ticket_ids, list) or not ticket_ids or not isinstance(is_app_issue, bool):
+        return jsonify({'success': False, 'message': 'Missing required fields'}), 400
+    if not all(isinstance(ticket_id, int) and not isinstance(ticket_id, bool) for ticket_id in ticket_ids):
+        return jsonify({'success': False, 'message': 'ticket_ids must be integers'}), 400
+    if len(ticket_ids) > current_app.config['ANNOTATION_BATCH_MAX']:
+        return jsonify({'success': False, 'message': 'At most %d tickets per request'
+                        % current_app.config['ANNOTATION_BATCH_MAX']}), 400
+    
+    outside = set(ticket_ids) - duplicates.cluster_members(cluster_id, ticket_ids)
+    if outside:
+        return jsonify({'success': False, 'message': 'Tickets not in cluster %d: %s'
+                        % (cluster_id, ', '.join(map(str, sorted(outside))))}), 409
+    
+    skipped = leases.held_by_others(current_user, ticket_ids)
+    results = labels.record_annotations(current_user, [
+        {'ticket_id': ticket_id, 'is_app_issue': is_app_issue, 'rationale': data.get('rationale') or ''}
+        for ticket_id in dict.fromkeys(ticket_ids) if ticket_id not in skipped
+    ])
+    db.session.commit()
+    return jsonify({'success': True, 'annotated': sum(result['status'] == 'created' for result in results),
+                    'skipped': sorted(skipped)})
+
+@bp.route('/api/export')
+@login_required
+def export_annotations():
+    """
+    API endpoint streaming an export of the annotations.
+    
+    Returns labeled tickets with their latest annotation, or the annotation
+    history with ``history=1``, as gzipped JSON Lines (``format=jsonl``),
+    gzipped CSV (``format=csv``) or Parquet (``format=parquet``).
+    ``include_unlabeled=1`` adds tickets that have no annotation yet.
+    """
+    fmt = request.args.get('format', 'jsonl')
+    history = request.args.get('history', 0, type=int) == 1
+    include_unlabeled = request.args.get('include_unlabeled', 0, type=int) == 1
+    
+    try:
+        chunks = exporter.stream(fmt, history, include_unlabeled)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    extension, mimetype = exporter.FORMATS[fmt]
+    filename = '%s-%s.%s' % ('annotation-history' if history else 'annotations',
+                             datetime.utcnow().strftime('%Y%m%d'), extension)
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': 'attachment; filename=%s' % filename})
+
 @bp.route('/load_sample_data')
 @login_required
 def load_sample_data():
     """
     Load sample data from JSON file.
     
-    Imports ticket data from a JSON file and creates the necessary database records.
+    Starts a background job importing ticket data from the JSON file and
+    returns to the dashboard, which polls the job's progress.
     Only accessible to authenticated users.
     """
+    input_file_path = current_app.config['TICKETS_JSON_FILE']
+    if not os.path.exists(input_file_path):
+        flash('JSON file not found: %s' % input_file_path, 'error')
+        return redirect(url_for('main.dashboard'))
     
-    try:
-        # Load JSON file
-        input_file_path = current_app.config['TICKETS_JSON_FILE']
-        if not os.path.exists(input_file_path):
-            flash('JSON file not found: %s' % input_file_path, 'error')
-            return redirect(url_for('main.dashboard'))
-        
-        df = pd.read_json(input_file_path, compression="gzip")
-        
-        # Create categories if they don't exist
-        categories = [
-            'account', 'background checks', 'document assistance', 
-            'license and certification', 'shift attendance', 'shift cancellation', 
-            'payment', 'technical issues', 'timesheet submission', 'others'
-        ]
-        
-        category_objects = {}
-        for category_name in categories:
-            category = Category.query.filter_by(name=category_name).first()
-            if not category:
-                category = Category(name=category_name)
-                db.session.add(category)
-            category_objects[category_name] = category
-        
-        db.session.commit()
-        
-        # Process each row in the JSON file
-        tickets_added = 0
-        for _, row in df.iterrows():
-            in_app_issue_likelihood = row['IN_APP_ISSUE_LIKELIHOOD']
-            issue_description_not_an_issue = row['NOT_AN_ISSUE']
-            
-            likelihood = 'possible'
-            if in_app_issue_likelihood == 4 and not issue_description_not_an_issue:
-                likelihood = 'likely'
-            elif in_app_issue_likelihood < 4 and issue_description_not_an_issue:
-                # unlikely an issue: skip
-                continue
+    job = jobs.submit('import_tickets', user=current_user)
+    flash('Import started.', 'success')
+    return redirect(url_for('main.dashboard', job_id=job.id))
 
-            # Check if ticket already exists
-            existing_ticket = Ticket.query.filter_by(ticket_id=str(row['TICKET_ID'])).first()
-            if existing_ticket:
-                continue
-            
-            # Create new ticket
-            ticket = Ticket(
-                ticket_id=str(row['TICKET_ID']),
-                subject=row['SUBJECT'],
-                summary=row.get('SUMMARY', None),
-                conversation=row.get('CHAT_HISTORY', None),
-                tech_issue_likelihood=likelihood,
-                issue_description=row.get('ISSUE_DESCRIPTION', None),
-                created_at_zendesk=datetime.strptime(row.get('CREATED_AT_PST', None), "%Y-%m-%d").date()
-            )
-            
-            # Add categories
-            ticket_categories = row.get('REQUEST_CATEGORIES', '')
-            any_category_ok = False
-            for category_name in ticket_categories:
-                category_name = category_name.strip()
-                if category_name and category_name in category_objects:
-                    ticket.categories.append(category_objects[category_name])
-                    any_category_ok = True
-
-            if not any_category_ok:
-                ticket.categories.append(category_objects['others'])
-            
-            db.session.add(ticket)
-            tickets_added += 1
-            
-            # Commit in batches to avoid memory issues
-            if tickets_added % 100 == 0:
-                db.session.commit()
-        
-        # Final commit
-        db.session.commit()
-        
-        flash('Successfully loaded %s tickets from JSON file.' % tickets_added, 'success')
-    except Exception as e:
-        db.session.rollback()
-        flash('Error loading data: %s' % str(e), 'error')
+@bp.route('/api/jobs', methods=['POST'])
+@login_required
+def create_job():
+    """
+    API endpoint for starting a background job.
+    
+    Receives the job kind and optional parameters via JSON and returns the
+    new job's state.
+    """
+    data = request.json or {}
+    kind = data.get('kind')
+    
+    if kind == 'import_tickets' and not os.path.exists(current_app.config['TICKETS_JSON_FILE']):
+        return jsonify({'success': False, 'message': 'JSON file not found'}), 400
+    params = data.get('params')
+    if kind == 'export' and isinstance(params, dict):
+        fmt = params.get('format', 'jsonl')
+        if not isinstance(fmt, str) or fmt not in exporter.FORMATS:
+            return jsonify({'success': False, 'message': 'Unknown export format: %s' % fmt}), 400
     
-    return redirect(url_for('main.dashboard'))
\ No newline at end of file
+    try:
+        job = jobs.submit(kind, params, user=current_user)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({'success': True, 'job': job.to_dict()}), 202
+
+@bp.route('/api/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """API endpoint reporting the progress, throughput and errors of a background job."""
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
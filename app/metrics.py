@@ -0,0 +1,164 @@
+"""
+Request metrics for the Ticket Annotation Tool.
+
+Every request's latency and the number and total time of the SQL
+statements it executed are recorded per endpoint, using SQLAlchemy engine
+events to time statements. Statements executed many times with different
+parameters in one request are reported as likely N+1 queries. Metrics are
+kept with ``prometheus_client``; when ``PROMETHEUS_MULTIPROC_DIR`` is set,
+every web worker process writes them to that directory and ``/metrics``
+serves the totals of all workers, whichever worker answers the scrape.
+``/metrics`` is only served to scrapers sending ``METRICS_TOKEN`` as a
+bearer token. Requests slower than ``SLOW_REQUEST_MS`` are logged with
+their most expensive statements.
+"""
+import hmac
+import os
+import time
+from collections import defaultdict
+from flask import Response, abort, current_app, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class RequestStats:
+    """The SQL statements executed by one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        # statement: [executions, seconds]
+        self.statements = defaultdict(lambda: [0, 0.0])
+
+    def add(self, statement, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        totals = self.statements[statement]
+        totals[0] += 1
+        totals[1] += seconds
+
+    def repeated(self, threshold):
+        """Return ``(statement, executions, seconds)`` for statements run at least ``threshold`` times."""
+        return [(statement, count, seconds) for statement, (count, seconds) in self.statements.items()
+                if count >= threshold]
+
+    def worst(self, limit=3):
+        """Return the ``limit`` statements with the most total time as ``(statement, executions, seconds)``."""
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return [(statement, count, seconds) for statement, (count, seconds) in ranked[:limit]]
+
+
+class Metrics:
+    """Per-endpoint request and SQL metrics, in a registry of their own."""
+
+    def __init__(self):
+        self.registry = CollectorRegistry()
+        self.requests = Counter('http_requests', 'Requests by endpoint, method and status.',
+                                ('endpoint', 'method', 'status'), registry=self.registry)
+        self.latency = Histogram('http_request_duration_seconds', 'Request latency by endpoint.',
+                                 ('endpoint', 'method'), buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.queries = Histogram('db_queries_per_request', 'SQL statements executed per request.',
+                                 ('endpoint',), buckets=QUERY_BUCKETS, registry=self.registry)
+        self.sql_seconds = Counter('db_query_seconds', 'Time spent executing SQL statements.',
+                                   ('endpoint',), registry=self.registry)
+        self.n_plus_one = Counter('db_n_plus_one_requests',
+                                  'Requests that repeated one SQL statement at least N_PLUS_ONE_THRESHOLD times.',
+                                  ('endpoint',), registry=self.registry)
+
+    def record(self, endpoint, method, status, seconds, stats, n_plus_one):
+        self.requests.labels(endpoint, method, str(status)).inc()
+        self.latency.labels(endpoint, method).observe(seconds)
+        self.queries.labels(endpoint).observe(stats.queries)
+        self.sql_seconds.labels(endpoint).inc(stats.sql_seconds)
+        if n_plus_one:
+            self.n_plus_one.labels(endpoint).inc()
+
+    def render(self):
+        """Return the metrics in the Prometheus text format, totalled over all workers in multiprocess mode."""
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return generate_latest(registry)
+        return generate_latest(self.registry)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['metrics_started'].pop()
+    if has_request_context() and 'request_stats' in g:
+        g.request_stats.add(statement, time.perf_counter() - started)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # time so it is not taken for the next statement's on this connection
+    started = context.connection.info.get('metrics_started') if context.connection is not None else None
+    if started:
+        seconds = time.perf_counter() - started.pop()
+        if context.statement is not None and has_request_context() and 'request_stats' in g:
+            g.request_stats.add(context.statement, seconds)
+
+
+def _before_request():
+    g.request_stats = RequestStats()
+
+
+def _after_request(response):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return response
+    seconds = time.perf_counter() - stats.started
+    endpoint = request.endpoint or 'unknown'
+    repeated = stats.repeated(current_app.config['N_PLUS_ONE_THRESHOLD'])
+    current_app.extensions['metrics'].record(endpoint, request.method, response.status_code,
+                                             seconds, stats, bool(repeated))
+
+    for statement, count, sql_seconds in repeated:
+        current_app.logger.warning('Possible N+1 query in %s %s: %d executions in %.1f ms of %s',
+                                   request.method, request.path, count, sql_seconds * 1000,
+                                   _shorten(statement))
+    slow_ms = current_app.config['SLOW_REQUEST_MS']
+    if slow_ms and seconds * 1000 >= slow_ms:
+        worst = ''.join('\n  %d x %.1f ms: %s' % (count, sql_seconds * 1000, _shorten(statement))
+                        for statement, count, sql_seconds in stats.worst())
+        current_app.logger.warning('Slow request %s %s: %.1f ms, %d SQL statements in %.1f ms%s',
+                                   request.method, request.full_path.rstrip('?'), seconds * 1000,
+                                   stats.queries, stats.sql_seconds * 1000, worst)
+    return response
+
+
+def _shorten(statement, length=300):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= length else statement[:length] + '...'
+
+
+def metrics_view():
+    """Serve the metrics in the Prometheus text format to scrapers holding ``METRICS_TOKEN``."""
+    token = current_app.config['METRICS_TOKEN']
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token):
+        abort(401)
+    return Response(current_app.extensions['metrics'].render(), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_app(app, engine):
+    """Record request metrics for ``app`` and SQL timings from ``engine``, and serve ``/metrics``."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.extensions['metrics'] = Metrics()
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -1 +1 @@
-from app.models.models import User, Ticket, Category, Annotation
\ No newline at end of file
+from app.models.models import User, Ticket, Category, Annotation, ImportManifest, Job, DataVersion, DailyCategoryStats, TicketLease, LabelEvent, TicketSignature, TicketBand, TicketCluster
\ No newline at end of file
@@ -3,8 +3,13 @@ Database models for the Ticket Annotation Tool.
 
 This module defines the database models for users, tickets, categories, and annotations.
 """
+import zlib
 from datetime import datetime
+from flask import current_app, has_app_context
 from flask_login import UserMixin
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import deferred
+from sqlalchemy.types import TypeDecorator
 from app import db, login_manager
 
 class User(UserMixin, db.Model):
@@ -22,44 +27,88 @@ def load_user(id):
     """Load a user from the database by ID for Flask-Login."""
     return User.query.get(int(id))
 
+class CompressedText(TypeDecorator):
+    """
+    Text stored zlib-compressed when that makes it smaller.
+
+    Values longer than ``COMPRESS_MIN_LENGTH`` are written as compressed
+    bytes if ``COMPRESS_TICKET_TEXT`` is enabled. Reads return str whether
+    the stored value is compressed bytes or plain text, so existing rows keep
+    working and can be converted with ``flask compress-tickets``.
+    """
+    impl = db.Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not isinstance(value, str):
+            return value
+        config = current_app.config if has_app_context() else {}
+        if not config.get('COMPRESS_TICKET_TEXT', False) or \
+                len(value) < config.get('COMPRESS_MIN_LENGTH', 256):
+            return value
+        encoded = value.encode('utf-8')
+        compressed = zlib.compress(encoded)
+        return compressed if len(compressed) < len(encoded) else value
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, bytes):
+            return zlib.decompress(value).decode('utf-8')
+        return value
+
 # Association table for many-to-many relationship between Ticket and Category
 ticket_category = db.Table('ticket_category',
     db.Column('ticket_id', db.Integer, db.ForeignKey('ticket.id'), primary_key=True),
-    db.Column('category_id', db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    db.Column('category_id', db.Integer, db.ForeignKey('category.id'), primary_key=True),
+    # Category filters look up tickets of a category in id order
+    db.Index('ix_ticket_category_category_id_ticket_id', 'category_id', 'ticket_id')
 )
 
 class Ticket(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.String(64), index=True, unique=True)
     subject = db.Column(db.String(256))
-    summary = db.Column(db.Text, nullable=True)
-    conversation = db.Column(db.Text, nullable=True)
+    # Large text is only loaded where it is displayed, e.g. with
+    # options(undefer_group('text'))
+    summary = deferred(db.Column(CompressedText, nullable=True), group='text')
+    conversation = deferred(db.Column(CompressedText, nullable=True), group='text')
     tech_issue_likelihood = db.Column(db.String(64), nullable=True)
     subject = db.Column(db.String(256))
-    issue_description = db.Column(db.Text, nullable=True)
-    created_at_zendesk = db.Column(db.DateTime)
+    issue_description = deferred(db.Column(CompressedText, nullable=True), group='text')
+    created_at_zendesk = db.Column(db.DateTime, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Hash of the imported source record, used to detect changed tickets
+    content_hash = db.Column(db.String(40), nullable=True)
+    
+    # Label state derived from the annotations, maintained by app.labels
+    current_label = db.Column(db.String(16), index=True, nullable=False,
+                              default='unlabeled', server_default='unlabeled')
+    latest_annotation_id = db.Column(db.Integer, db.ForeignKey('annotation.id', use_alter=True,
+                                                               name='fk_ticket_latest_annotation_id'))
+    annotation_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relationships
     categories = db.relationship('Category', secondary=ticket_category,
                                backref=db.backref('tickets', lazy='dynamic'))
-    annotations = db.relationship('Annotation', backref='ticket', lazy='dynamic')
+    annotations = db.relationship('Annotation', backref='ticket', lazy='dynamic',
+                                  foreign_keys='Annotation.ticket_id')
+    latest_annotation = db.relationship('Annotation', foreign_keys=[latest_annotation_id],
+                                        viewonly=True)
     
     def __repr__(self):
         return '<Ticket {}>'.format(self.ticket_id)
     
     def get_latest_annotation(self):
         """Return the most recent annotation for this ticket, or None if no annotations exist."""
-        return self.annotations.order_by(Annotation.created_at.desc()).first()
+        return self.latest_annotation
     
     def is_annotated(self):
         """Check if the ticket has been annotated."""
-        return self.annotations.count() > 0
+        return self.annotation_count > 0
     
     def is_app_issue(self):
         """Return the latest annotation verdict, or None if no annotations exist."""
-        latest = self.get_latest_annotation()
-        return latest.is_app_issue if latest else None
+        return {'positive': True, 'negative': False}.get(self.current_label)
 
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -72,11 +121,213 @@ class Annotation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     is_app_issue = db.Column(db.Boolean, nullable=False)
     rationale = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Client-supplied key that makes retried batch submissions safe
+    idempotency_key = db.Column(db.String(64), nullable=True)
     
     # Foreign keys
     ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
     def __repr__(self):
-        return '<Annotation {} for Ticket {}>'.format(self.id, self.ticket_id)
\ No newline at end of file
+        return '<Annotation {} for Ticket {}>'.format(self.id, self.ticket_id)
+
+# Covers the newest-verdict lookup per ticket (see latest_annotations)
+db.Index('ix_annotation_ticket_id_created_at', Annotation.ticket_id, Annotation.created_at.desc(),
+         Annotation.is_app_issue)
+
+# Idempotency keys are unique per annotator; annotations without one are not constrained
+db.Index('ix_annotation_user_id_idempotency_key', Annotation.user_id, Annotation.idempotency_key,
+         unique=True)
+
+class ImportManifest(db.Model):
+    """Progress of the latest import of an input file, used to skip or resume imports."""
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(512), index=True, unique=True)
+    file_hash = db.Column(db.String(64))
+    file_size = db.Column(db.BigInteger)
+    offset = db.Column(db.BigInteger, nullable=False, default=0)
+    # SHA-256 of the uncompressed file up to offset, to resume after appends
+    prefix_hash = db.Column(db.String(64), nullable=True)
+    records_read = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(16), nullable=False, default='running')  # running, complete
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return '<ImportManifest {} {}>'.format(self.path, self.status)
+class Job(db.Model):
+    """A long-running task, such as an import, executed off the request path by app.jobs."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    params = db.Column(db.Text, nullable=True)  # JSON
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, complete, failed
+    progress = db.Column(db.BigInteger, nullable=False, default=0)
+    total = db.Column(db.BigInteger, nullable=True)
+    rows_per_sec = db.Column(db.Float, nullable=True)
+    message = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    # Foreign keys
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    
+    def __repr__(self):
+        return '<Job {} {} {}>'.format(self.id, self.kind, self.status)
+    
+    def to_dict(self):
+        """Return the job state as a JSON-serializable dict."""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'percent': round(100.0 * self.progress / self.total, 1) if self.total else None,
+            'rows_per_sec': self.rows_per_sec,
+            'message': self.message,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class DataVersion(db.Model):
+    """
+    A counter bumped whenever annotations or imports change ticket data.
+
+    The table holds a single row. Caches key their entries on the version so
+    every web worker notices writes made by the others.
+    """
+    __tablename__ = 'data_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return '<DataVersion {}>'.format(self.version)
+
+class TicketLease(db.Model):
+    """
+    A time-limited claim of a ticket by an annotator.
+
+    Each ticket has at most one lease. While it has not expired, the ticket
+    is left out of other annotators' unlabeled queues; see app.leases.
+    """
+    __tablename__ = 'ticket_lease'
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    claimed_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return '<TicketLease {} by {}>'.format(self.ticket_id, self.user_id)
+
+class LabelEvent(db.Model):
+    """
+    A change of a ticket's label, recorded once per category of the ticket.
+
+    Open dashboards apply these to their counts in place; see app.events.
+    Ids never decrease or get reused, so clients can resume after the last
+    id they saw.
+    """
+    __tablename__ = 'label_event'
+    __table_args__ = {'sqlite_autoincrement': True}
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False)
+    date = db.Column(db.Date, nullable=True)  # the ticket's Zendesk creation day
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    old_label = db.Column(db.String(16), nullable=False)
+    new_label = db.Column(db.String(16), nullable=False)
+    
+    def __repr__(self):
+        return '<LabelEvent {} {} -> {}>'.format(self.ticket_id, self.old_label, self.new_label)
+
+class DailyCategoryStats(db.Model):
+    """
+    Ticket counts per Zendesk creation day, category and label.
+
+    A rollup of ``Ticket`` and ``ticket_category`` kept up to date by app.rollup,
+    so daily charts read one row per day and category.
+    """
+    __tablename__ = 'daily_category_stats'
+    date = db.Column(db.Date, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    unlabeled = db.Column(db.Integer, nullable=False, default=0)
+    positive = db.Column(db.Integer, nullable=False, default=0)
+    negative = db.Column(db.Integer, nullable=False, default=0)
+    
+    category = db.relationship('Category')
+    
+    def __repr__(self):
+        return '<DailyCategoryStats {} {}>'.format(self.date, self.category_id)
+
+class TicketSignature(db.Model):
+    """The MinHash signature of a ticket's text, used to find near-duplicates; see app.duplicates."""
+    __tablename__ = 'ticket_signature'
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)
+    
+    def __repr__(self):
+        return '<TicketSignature {}>'.format(self.ticket_id)
+
+class TicketBand(db.Model):
+    """
+    A ticket in the bucket of one band of its signature.
+
+    Tickets sharing a bucket are candidate near-duplicates. The primary key
+    is the only index, so the table has no rowid.
+    """
+    __tablename__ = 'ticket_band'
+    __table_args__ = {'sqlite_with_rowid': False}
+    band = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), primary_key=True)
+    
+    def __repr__(self):
+        return '<TicketBand {} {} {}>'.format(self.band, self.bucket, self.ticket_id)
+
+class TicketCluster(db.Model):
+    """
+    A ticket's cluster of near-duplicates, identified by its smallest ticket id.
+
+    Tickets without near-duplicates have no row.
+    """
+    __tablename__ = 'ticket_cluster'
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), primary_key=True)
+    cluster_id = db.Column(db.Integer, nullable=False, index=True)
+    
+    def __repr__(self):
+        return '<TicketCluster {} in {}>'.format(self.ticket_id, self.cluster_id)
+
+def latest_annotations(*criteria):
+    """
+    Return a subquery with the newest annotation of every annotated ticket.
+
+    The subquery has ``ticket_id``, ``annotation_id`` and ``is_app_issue``
+    columns and one row per ticket. Optional criteria on ``Annotation``
+    restrict the annotations considered before ranking.
+    """
+    ranked = select(
+        Annotation.ticket_id,
+        Annotation.id.label('annotation_id'),
+        Annotation.is_app_issue,
+        func.row_number().over(
+            partition_by=Annotation.ticket_id,
+            order_by=(Annotation.created_at.desc(), Annotation.id.desc())
+        ).label('rank')
+    ).where(*criteria).subquery()
+    return (select(ranked.c.ticket_id, ranked.c.annotation_id, ranked.c.is_app_issue)
+            .where(ranked.c.rank == 1)
+            .subquery('latest_annotation'))
+
+def annotation_label(latest):
+    """Label expression ('unlabeled', 'positive' or 'negative') over an outer-joined ``latest_annotations()``."""
+    return case(
+        (latest.c.ticket_id.is_(None), 'unlabeled'),
+        (latest.c.is_app_issue == True, 'positive'),
+        else_='negative'
+    )
@@ -0,0 +1,100 @@
+"""
+Annotation queue navigation for the Ticket Annotation Tool.
+
+The annotation queue is the set of tickets matching a category and status
+filter, and optionally a full-text search, ordered by ticket id. Navigation uses keyset lookups on the id
+(``WHERE id > :current ORDER BY id LIMIT 1``) and positions are computed
+with COUNT queries, so no step loads the whole queue or any ticket text.
+"""
+from sqlalchemy import func, select
+from app import db, search
+from app.models import Ticket
+from app.models.models import ticket_category
+
+STATUSES = ('unlabeled', 'positive', 'negative')
+
+
+def queue_ids(category_id='all', status='unlabeled', q=None):
+    """Return a select of the ids of tickets matching the queue filters."""
+    stmt = select(Ticket.id)
+    if category_id != 'all':
+        stmt = (stmt.join(ticket_category, ticket_category.c.ticket_id == Ticket.id)
+                .where(ticket_category.c.category_id == int(category_id)))
+    if status in STATUSES:
+        stmt = stmt.where(Ticket.current_label == status)
+    if search.match_query(q):
+        stmt = stmt.where(Ticket.id.in_(search.matching_ids(q)))
+    return stmt
+
+
+def first_id(category_id='all', status='unlabeled', q=None):
+    """Return the id of the first ticket in the queue, or None if it is empty."""
+    stmt = queue_ids(category_id, status, q).order_by(Ticket.id).limit(1)
+    return db.session.execute(stmt).scalar()
+
+
+def last_id(category_id='all', status='unlabeled', q=None):
+    """Return the id of the last ticket in the queue, or None if it is empty."""
+    stmt = queue_ids(category_id, status, q).order_by(Ticket.id.desc()).limit(1)
+    return db.session.execute(stmt).scalar()
+
+
+def next_id(current_id, category_id='all', status='unlabeled', q=None):
+    """
+    Return the id of the ticket after ``current_id`` in the queue.
+
+    Wraps around to the first ticket after the end of the queue. Returns
+    None if the queue is empty.
+    """
+    if current_id is not None:
+        stmt = (queue_ids(category_id, status, q)
+                .where(Ticket.id > current_id)
+                .order_by(Ticket.id)
+                .limit(1))
+        ticket_id = db.session.execute(stmt).scalar()
+        if ticket_id is not None:
+            return ticket_id
+    return first_id(category_id, status, q)
+
+
+def prev_id(current_id, category_id='all', status='unlabeled', q=None):
+    """
+    Return the id of the ticket before ``current_id`` in the queue.
+
+    Wraps around to the last ticket before the start of the queue. Returns
+    None if the queue is empty.
+    """
+    if current_id is not None:
+        stmt = (queue_ids(category_id, status, q)
+                .where(Ticket.id < current_id)
+                .order_by(Ticket.id.desc())
+                .limit(1))
+        ticket_id = db.session.execute(stmt).scalar()
+        if ticket_id is not None:
+            return ticket_id
+    return last_id(category_id, status, q)
+
+
+def next_ids(after_id, limit, category_id='all', status='unlabeled', q=None):
+    """Return up to ``limit`` queue ticket ids following ``after_id``, in order."""
+    stmt = (queue_ids(category_id, status, q)
+            .where(Ticket.id > after_id)
+            .order_by(Ticket.id)
+            .limit(limit))
+    return db.session.execute(stmt).scalars().all()
+
+
+def total(category_id='all', status='unlabeled', q=None):
+    """Return the number of tickets in the queue."""
+    stmt = select(func.count()).select_from(queue_ids(category_id, status, q).subquery())
+    return db.session.execute(stmt).scalar()
+
+
+def position(ticket_id, category_id='all', status='unlabeled', q=None):
+    """
+    Return the 1-based position of ``ticket_id`` in the queue.
+
+    Tickets outside the queue get the position they would occupy.
+    """
+    ids = queue_ids(category_id, status, q).where(Ticket.id < ticket_id).subquery()
+    return db.session.execute(select(func.count()).select_from(ids)).scalar() + 1
@@ -0,0 +1,108 @@
+"""
+Daily ticket rollup for the Ticket Annotation Tool.
+
+The ``daily_category_stats`` table holds the number of unlabeled, positive
+and negative tickets per Zendesk creation day and category. Imports and
+annotations add their changes to it as deltas in the same transaction as
+the tickets, so daily charts read one row per day and category instead of
+grouping every ticket. ``rebuild`` recomputes the whole table.
+"""
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import bindparam, case, delete, func, insert, select, tuple_, update
+from app import cache, db
+from app.models import Ticket, DailyCategoryStats
+from app.models.models import ticket_category
+
+LABELS = ('unlabeled', 'positive', 'negative')
+
+
+class Deltas:
+    """Count changes per ``(date, category_id)`` and label, to be applied with ``apply``."""
+
+    def __init__(self):
+        self.counts = defaultdict(lambda: dict.fromkeys(LABELS, 0))
+
+    def add(self, day, category_ids, label, amount=1):
+        """Add ``amount`` tickets with ``label`` on ``day`` to each of ``category_ids``."""
+        if day is None:
+            return
+        if isinstance(day, datetime):
+            day = day.date()
+        for category_id in category_ids:
+            self.counts[(day, category_id)][label] += amount
+
+    def relabel(self, day, category_ids, old_label, new_label):
+        """Move tickets of ``day`` and ``category_ids`` from ``old_label`` to ``new_label``."""
+        if old_label != new_label:
+            self.add(day, category_ids, old_label, -1)
+            self.add(day, category_ids, new_label)
+
+
+def ticket_state(ticket_ids):
+    """
+    Return what tickets currently contribute to the rollup.
+
+    Maps each ticket id to a ``(created_at_zendesk, current_label,
+    category_ids)`` tuple.
+    """
+    state = {}
+    stmt = (select(Ticket.id, Ticket.created_at_zendesk, Ticket.current_label,
+                   ticket_category.c.category_id)
+            .join(ticket_category, ticket_category.c.ticket_id == Ticket.id)
+            .where(Ticket.id.in_(ticket_ids)))
+    for ticket_id, created_at, label, category_id in db.session.execute(stmt):
+        state.setdefault(ticket_id, (created_at, label, []))[2].append(category_id)
+    return state
+
+
+def apply(deltas, chunk_size=500):
+    """
+    Add ``deltas`` to the rollup in the current session.
+
+    Existing rows are incremented in place and missing ones inserted. The
+    caller commits the rollup together with the ticket changes.
+    """
+    changes = {key: counts for key, counts in deltas.counts.items() if any(counts.values())}
+    keys = list(changes)
+    existing = set()
+    for start in range(0, len(keys), chunk_size):
+        existing.update(tuple(row) for row in db.session.execute(
+            select(DailyCategoryStats.date, DailyCategoryStats.category_id)
+            .where(tuple_(DailyCategoryStats.date, DailyCategoryStats.category_id)
+                   .in_(keys[start:start + chunk_size]))
+        ))
+
+    table = DailyCategoryStats.__table__
+    updates = [dict({'b_date': day, 'b_category_id': category_id},
+                    **{'d_' + label: count for label, count in changes[day, category_id].items()})
+               for day, category_id in keys if (day, category_id) in existing]
+    if updates:
+        db.session.execute(
+            update(table)
+            .where(table.c.date == bindparam('b_date'),
+                   table.c.category_id == bindparam('b_category_id'))
+            .values({label: table.c[label] + bindparam('d_' + label) for label in LABELS}),
+            updates
+        )
+    inserts = [dict(changes[key], date=key[0], category_id=key[1])
+               for key in keys if key not in existing]
+    if inserts:
+        db.session.execute(insert(DailyCategoryStats), inserts)
+
+
+def rebuild():
+    """Recompute the rollup from the tickets, commit, and return the number of rows."""
+    day = func.date(Ticket.created_at_zendesk)
+    stmt = (select(day, ticket_category.c.category_id,
+                   *[func.sum(case((Ticket.current_label == label, 1), else_=0)) for label in LABELS])
+            .select_from(ticket_category)
+            .join(Ticket, Ticket.id == ticket_category.c.ticket_id)
+            .where(Ticket.created_at_zendesk.isnot(None))
+            .group_by(day, ticket_category.c.category_id))
+
+    db.session.execute(delete(DailyCategoryStats))
+    db.session.execute(insert(DailyCategoryStats).from_select(['date', 'category_id', *LABELS], stmt))
+    cache.bump_data_version()
+    db.session.commit()
+    return db.session.execute(select(func.count()).select_from(DailyCategoryStats)).scalar()
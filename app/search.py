@@ -0,0 +1,146 @@
+"""
+Full-text search over ticket content for the Ticket Annotation Tool.
+
+Ticket subjects, summaries, conversations and issue descriptions are
+indexed in ``ticket_fts``, a contentless SQLite FTS5 table whose rowid is
+the ticket id; it holds only the index, not a second, uncompressed copy of
+the text. The importer keeps it in step with the ``Ticket`` table chunk by
+chunk and ``rebuild`` recreates it from scratch. Results are ranked with
+FTS5's BM25 function, weighting subject matches above the longer text
+fields.
+"""
+import re
+from sqlalchemy import column, delete, func, insert, literal_column, select, table, text
+from app import db
+from app.models import Ticket
+
+COLUMNS = ('subject', 'summary', 'conversation', 'issue_description')
+
+# BM25 weights of COLUMNS, in order
+WEIGHTS = (4.0, 2.0, 1.0, 1.0)
+
+ticket_fts = table('ticket_fts', column('rowid'), *[column(name) for name in COLUMNS])
+
+# Holds the text of a search's results while their snippets are made
+ticket_snippet = table('ticket_snippet', column('rowid'), *[column(name) for name in COLUMNS], schema='temp')
+
+
+def create_index():
+    """Create the FTS5 table if it doesn't exist."""
+    db.session.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_fts USING fts5(%s, content='', tokenize='porter unicode61')"
+        % ', '.join(COLUMNS)))
+    db.session.commit()
+
+
+def match_query(query):
+    """
+    Turn free text into an FTS5 query matching tickets that contain every word.
+
+    Words are quoted so that punctuation and FTS5 operators in the input are
+    searched for literally; a trailing ``*`` keeps its prefix meaning.
+    Returns None if the input contains no words.
+    """
+    terms = ['"%s"%s' % (word, star) for word, star in re.findall(r'(\w+)(\*?)', query or '')]
+    return ' '.join(terms) or None
+
+
+def index_tickets(rows):
+    """Add tickets to the index; ``rows`` are dicts with ``id`` and the text columns."""
+    if rows:
+        db.session.execute(insert(ticket_fts), [
+            dict({name: row.get(name) for name in COLUMNS}, rowid=row['id']) for row in rows
+        ])
+
+
+def _text(ticket_ids):
+    """Return dicts with the id and text columns of tickets, decompressed."""
+    stmt = select(Ticket.id, *[getattr(Ticket, name) for name in COLUMNS]).where(Ticket.id.in_(ticket_ids))
+    return [row._asdict() for row in db.session.execute(stmt)]
+
+
+def remove_tickets(ticket_ids):
+    """
+    Remove tickets from the index.
+
+    A contentless table can only remove a row given the text it was indexed
+    with, so call this before the tickets' text changes.
+    """
+    if ticket_ids:
+        db.session.execute(text(
+            "INSERT INTO ticket_fts (ticket_fts, rowid, %s) VALUES ('delete', :id, %s)"
+            % (', '.join(COLUMNS), ', '.join(':' + name for name in COLUMNS))), _text(ticket_ids))
+
+
+def rebuild(chunk_size=10000):
+    """Recreate the index from the ``Ticket`` table, commit, and return the number of tickets indexed."""
+    create_index()
+    db.session.execute(text("INSERT INTO ticket_fts (ticket_fts) VALUES ('delete-all')"))
+    # Read through the ORM columns so compressed text is indexed decompressed
+    stmt = select(Ticket.id, *[getattr(Ticket, name) for name in COLUMNS]).order_by(Ticket.id)
+    last_id = 0
+    while True:
+        rows = db.session.execute(stmt.where(Ticket.id > last_id).limit(chunk_size)).all()
+        if not rows:
+            break
+        index_tickets([row._asdict() for row in rows])
+        last_id = rows[-1].id
+    db.session.execute(text("INSERT INTO ticket_fts(ticket_fts) VALUES ('optimize')"))
+    db.session.commit()
+    return db.session.execute(select(func.count()).select_from(ticket_fts)).scalar()
+
+
+def matching_ids(query):
+    """Return a select of the ids of tickets matching the free-text ``query``."""
+    return select(ticket_fts.c.rowid).where(literal_column('ticket_fts').op('MATCH')(match_query(query)))
+
+
+def search(query, limit=20, candidates=None):
+    """
+    Return the tickets best matching the free-text ``query``.
+
+    ``candidates`` optionally restricts the results to a select of ticket
+    ids, such as an annotation queue. Returns a list of ``(ticket_id, score,
+    snippet)`` tuples, best match first; lower BM25 scores are better.
+    """
+    if match_query(query) is None:
+        return []
+    rank = func.bm25(literal_column('ticket_fts'), *WEIGHTS).label('score')
+    stmt = (select(ticket_fts.c.rowid, rank)
+            .where(literal_column('ticket_fts').op('MATCH')(match_query(query)))
+            .order_by(rank)
+            .limit(limit))
+    if candidates is not None:
+        # Check each match against the candidates by primary key; an IN list
+        # would be handed to FTS5 as rowid lookups, running the match once
+        # per candidate
+        stmt = stmt.where(candidates.where(Ticket.id == ticket_fts.c.rowid).exists())
+    matches = db.session.execute(stmt).all()
+    snippets = _snippets(query, [ticket_id for ticket_id, _ in matches])
+    return [(ticket_id, score, snippets.get(ticket_id)) for ticket_id, score in matches]
+
+
+def _snippets(query, ticket_ids):
+    """
+    Return highlighted snippets of the tickets matching ``query``, by ticket id.
+
+    FTS5 can't make snippets from a contentless table, so the text of the
+    tickets is copied into a temporary FTS5 table of the connection with the
+    same tokenizer, where ``snippet`` picks and highlights the best matching
+    column.
+    """
+    if not ticket_ids:
+        return {}
+    db.session.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS temp.ticket_snippet USING fts5(%s, tokenize='porter unicode61')"
+        % ', '.join(COLUMNS)))
+    db.session.execute(insert(ticket_snippet), [
+        dict({name: row[name] for name in COLUMNS}, rowid=row['id']) for row in _text(ticket_ids)
+    ])
+    try:
+        snippet = func.snippet(literal_column('ticket_snippet'), -1, '[', ']', '...', 12)
+        stmt = (select(ticket_snippet.c.rowid, snippet)
+                .where(literal_column('ticket_snippet').op('MATCH')(match_query(query))))
+        return dict(db.session.execute(stmt).all())
+    finally:
+        db.session.execute(delete(ticket_snippet))
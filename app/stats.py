@@ -0,0 +1,127 @@
+"""
+Dashboard statistics for the Ticket Annotation Tool.
+
+This module computes the per-category annotation summary with a grouped
+query instead of one query per category or per ticket, and reads the daily
+series shown on the dashboard from the ``daily_category_stats`` rollup.
+"""
+from datetime import timedelta
+from sqlalchemy import func, select
+from app import db
+from app.models import Ticket, Category, DailyCategoryStats
+from app.models.models import ticket_category
+
+LABELS = ('unlabeled', 'positive', 'negative')
+
+
+def _labeled_tickets(*columns, start_date=None, end_date=None, category_id='all'):
+    """
+    Count tickets grouped by ``columns`` and their current label.
+
+    The date range applies to ``Ticket.created_at_zendesk`` and is inclusive
+    of both ends.
+    """
+    stmt = (select(*columns, Ticket.current_label.label('label'), func.count().label('count'))
+            .select_from(ticket_category)
+            .join(Ticket, Ticket.id == ticket_category.c.ticket_id)
+            .group_by(*columns, Ticket.current_label))
+
+    if start_date is not None:
+        stmt = stmt.where(Ticket.created_at_zendesk >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(Ticket.created_at_zendesk < end_date + timedelta(days=1))
+    if category_id != 'all':
+        stmt = stmt.where(ticket_category.c.category_id == int(category_id))
+    return stmt
+
+
+def summary_counts(start_date=None, end_date=None, category_id='all'):
+    """
+    Count unlabeled, positive and negative tickets per category.
+
+    A ticket's label is the label state maintained from its most recent
+    annotation.
+
+    Returns a dict mapping category id to a dict of label counts.
+    """
+    stmt = _labeled_tickets(ticket_category.c.category_id, start_date=start_date,
+                            end_date=end_date, category_id=category_id)
+
+    counts = {}
+    for cat_id, label, count in db.session.execute(stmt):
+        counts.setdefault(cat_id, dict.fromkeys(LABELS, 0))[label] = count
+    return counts
+
+
+def summary_table(categories, start_date=None, end_date=None, category_id='all'):
+    """
+    Build the ``summary_data`` rows rendered by the dashboard template.
+
+    Every category in ``categories`` that matches the category filter gets a
+    row, including categories without tickets in the date range.
+    """
+    counts = summary_counts(start_date, end_date, category_id)
+
+    summary_data = []
+    for category in categories:
+        if category_id != 'all' and int(category_id) != category.id:
+            continue
+        row = counts.get(category.id, dict.fromkeys(LABELS, 0))
+        summary_data.append({
+            'category': category.name,
+            'category_id': category.id,
+            'unlabeled': row['unlabeled'],
+            'positive': row['positive'],
+            'negative': row['negative'],
+            'total': row['unlabeled'] + row['positive'] + row['negative']
+        })
+    return summary_data
+
+
+def daily_rows(start_date=None, end_date=None, category_id='all'):
+    """
+    Return the daily rollup rows for the filters, ordered by date and category.
+
+    Each row has ``date`` (an ISO date string), ``category``, one count per
+    label and ``count``, the day's total. The date range is inclusive and
+    days without tickets are omitted.
+    """
+    total = DailyCategoryStats.unlabeled + DailyCategoryStats.positive + DailyCategoryStats.negative
+    stmt = (select(DailyCategoryStats.date, Category.name,
+                   *[getattr(DailyCategoryStats, label) for label in LABELS], total)
+            .join(Category, Category.id == DailyCategoryStats.category_id)
+            .where(total > 0)
+            .order_by(DailyCategoryStats.date, Category.name))
+
+    if start_date is not None:
+        stmt = stmt.where(DailyCategoryStats.date >= start_date.date())
+    if end_date is not None:
+        stmt = stmt.where(DailyCategoryStats.date <= end_date.date())
+    if category_id != 'all':
+        stmt = stmt.where(DailyCategoryStats.category_id == int(category_id))
+
+    columns = ['date', 'category', *LABELS, 'count']
+    return [dict(zip(columns, (day.isoformat(), *rest))) for day, *rest in db.session.execute(stmt)]
+
+
+def daily_columns(start_date=None, end_date=None, category_id='all', metric='count'):
+    """
+    Return the daily series for the filters as columnar arrays.
+
+    The result holds the sorted ``dates`` and, per category, the ``metric``
+    (a label or ``count``) for each date, with None on days without tickets
+    in that category.
+    """
+    rows = daily_rows(start_date, end_date, category_id)
+    dates = sorted({row['date'] for row in rows})
+    index = {day: i for i, day in enumerate(dates)}
+
+    values = {}
+    for row in rows:
+        series = values.setdefault(row['category'], [None] * len(dates))
+        series[index[row['date']]] = row[metric]
+    return {
+        'metric': metric,
+        'dates': dates,
+        'series': [{'category': name, 'values': series} for name, series in sorted(values.items())]
+    }
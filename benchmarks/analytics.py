@@ -0,0 +1,103 @@
+"""
+Benchmark the annotation analytics reports.
+
+Seeds annotation histories of increasing size from a pool of annotators
+who label tickets at their own pace with breaks, disagree on some tickets
+and relabel others. Times a worker's first read of the history into
+columns, computing the agreement, throughput and flip reports, and
+``/api/reports`` after a new annotation, which reads only that annotation
+before recomputing, and from the cache. Run from the project root:
+
+    python -m benchmarks.analytics --annotations 1000000,3000000
+"""
+import argparse
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+import numpy as np
+from sqlalchemy import insert
+from app import analytics, cache, db
+from app.models import User, Ticket, Annotation
+from benchmarks.common import make_app, login
+
+
+def seed_history(n_annotations, n_users, chunk_size=100000, seed=42):
+    """Insert ``n_users`` annotators, tickets and ``n_annotations`` annotations."""
+    rng = np.random.default_rng(seed)
+    users = [User(email='annotator%d@example.com' % i, name='Annotator %d' % i) for i in range(n_users)]
+    db.session.add_all(users)
+    db.session.commit()
+
+    # About 2.5 annotations per ticket, so most tickets have several annotators
+    n_tickets = max(1, int(n_annotations / 2.5))
+    for start in range(1, n_tickets + 1, chunk_size):
+        db.session.execute(insert(Ticket), [{'id': ticket_id, 'ticket_id': str(1000000 + ticket_id)}
+                                            for ticket_id in range(start, min(start + chunk_size, n_tickets + 1))])
+    truth = rng.random(n_tickets + 1) < 0.3
+    tickets = rng.integers(1, n_tickets + 1, n_annotations)
+    annotators = rng.integers(0, n_users, n_annotations)
+    verdicts = truth[tickets] ^ (rng.random(n_annotations) < 0.15)
+
+    # Each annotator labels every 10 to 60 seconds, with a break now and then
+    gaps = rng.integers(10, 60, n_annotations) + (rng.random(n_annotations) < 0.01) * 3600
+    order = np.argsort(annotators, kind='stable')
+    elapsed = np.cumsum(gaps[order])
+    # Less the time elapsed before each annotator's first annotation
+    elapsed -= (elapsed - gaps[order])[np.searchsorted(annotators[order], annotators[order])]
+    times = np.empty(n_annotations, dtype=np.int64)
+    times[order] = elapsed + int(datetime(2025, 5, 1).timestamp())
+
+    # Saved in time order, like annotations submitted as they happen
+    user_ids = np.array([user.id for user in users])
+    for chunk in np.array_split(np.argsort(times, kind='stable'), max(1, n_annotations // chunk_size)):
+        db.session.execute(insert(Annotation), [
+            {'ticket_id': int(tickets[i]), 'user_id': int(user_ids[annotators[i]]), 'is_app_issue': bool(verdicts[i]),
+             'created_at': datetime.utcfromtimestamp(int(times[i]))}
+            for i in chunk])
+    cache.bump_data_version()
+    db.session.commit()
+    return users[0].id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--annotations', default='1000000,3000000', help='Comma-separated history sizes')
+    parser.add_argument('--users', type=int, default=25)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', FutureWarning)
+
+    for n_annotations in map(int, args.annotations.split(',')):
+        app = make_app()
+        with app.app_context():
+            user_id = seed_history(n_annotations, args.users)
+
+            start = time.perf_counter()
+            columns = analytics.history().update()
+            load = time.perf_counter() - start
+            start = time.perf_counter()
+            report = analytics.report(columns)
+            compute = time.perf_counter() - start
+            # Measured separately, as tracing allocations slows the reports down
+            tracemalloc.start()
+            analytics.report(columns)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            ticket_id = report['flips']['top'][0]['ticket']
+            db.session.rollback()
+
+        client = app.test_client()
+        login(client, user_id)
+        assert client.post('/api/annotate', json={'ticket_id': ticket_id, 'is_app_issue': True}).status_code == 200
+        latencies = []
+        for _ in range(2):
+            start = time.perf_counter()
+            assert client.get('/api/reports').status_code == 200
+            latencies.append(time.perf_counter() - start)
+        print('%8d annotations  load=%6.0f ms  compute=%5.0f ms  after an annotation=%5.0f ms  cached=%5.1f ms  '
+              'peak=%4.0f MiB  fleiss=%.3f  flipped=%d' % (
+                  n_annotations, load * 1000, compute * 1000, latencies[0] * 1000, latencies[1] * 1000,
+                  peak / 2.0 ** 20, report['agreement']['fleiss_kappa'], report['flips']['tickets']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark annotation throughput of the single-item and batch endpoints.
+
+Submits the same number of annotations one per ``/api/annotate`` request
+and in ``/api/annotations/batch`` requests of several sizes, each against a
+freshly seeded database, and reports annotations per second. Run from the
+project root:
+
+    python -m benchmarks.annotation_batch --tickets 100000 --annotations 2000
+"""
+import argparse
+import random
+import time
+import warnings
+from benchmarks.common import make_app, seed, login
+
+
+def submit_single(client, items):
+    """Post each annotation to ``/api/annotate``."""
+    for item in items:
+        client.post('/api/annotate', json=item)
+
+
+def submit_batches(client, items, size):
+    """Post the annotations to ``/api/annotations/batch`` in batches of ``size``."""
+    for start in range(0, len(items), size):
+        response = client.post('/api/annotations/batch', json={'annotations': items[start:start + size]})
+        assert response.json['counts']['created'] == len(items[start:start + size])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--annotations', type=int, default=2000)
+    parser.add_argument('--batch-sizes', default='10,100,1000',
+                        help='Comma-separated batch sizes to compare with single requests')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    rng = random.Random(7)
+    items = [{'ticket_id': rng.randint(1, args.tickets), 'is_app_issue': rng.random() < 0.3,
+              'rationale': 'benchmark', 'idempotency_key': 'bench-%d' % index}
+             for index in range(args.annotations)]
+
+    runs = [('single requests', submit_single)]
+    for size in map(int, args.batch_sizes.split(',')):
+        runs.append(('batches of %d' % size, lambda client, items, size=size: submit_batches(client, items, size)))
+
+    for name, submit in runs:
+        app = make_app()
+        with app.app_context():
+            user_id = seed(args.tickets).id
+        client = app.test_client()
+        login(client, user_id)
+
+        start = time.perf_counter()
+        submit(client, items)
+        seconds = time.perf_counter() - start
+        print('%-18s %8.0f annotations/sec  (%.2fs for %d)' % (
+            name, len(items) / seconds, seconds, len(items)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Benchmark annotation queue navigation.
+
+Times the keyset next/previous lookups and the position/total counts used
+by ``/annotate`` and ``/api/next_ticket``. Run from the project root:
+
+    python -m benchmarks.annotation_queue --tickets 200000
+"""
+import argparse
+from app import db, queue
+from benchmarks.common import make_app, seed, count_queries, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        print('Seeding %d tickets...' % args.tickets)
+        seed(args.tickets)
+        middle = args.tickets // 2
+
+        for category_id in ('all', '3'):
+            print('category_id=%s' % category_id)
+            runs = [
+                ('next_id', lambda: queue.next_id(middle, category_id, 'unlabeled')),
+                ('prev_id', lambda: queue.prev_id(middle, category_id, 'unlabeled')),
+                ('position', lambda: queue.position(middle, category_id, 'unlabeled')),
+                ('total', lambda: queue.total(category_id, 'unlabeled')),
+            ]
+            for name, func in runs:
+                with count_queries(db.engine) as statements:
+                    func()
+                _, seconds = timed(func, args.repeat)
+                print('  %-10s queries=%-3d best=%.2f ms' % (name, len(statements), seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
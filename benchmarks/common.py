@@ -0,0 +1,151 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway SQLite database seeded with synthetic
+tickets, so they never touch ``instance/app.db``.
+"""
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert
+from app import create_app, db, labels, rollup, search
+from app.models import User, Ticket, Category, Annotation
+from app.models.models import ticket_category
+from config import Config
+
+CATEGORIES = [
+    'account', 'background checks', 'document assistance',
+    'license and certification', 'shift attendance', 'shift cancellation',
+    'payment', 'technical issues', 'timesheet submission', 'others'
+]
+
+# Words the synthetic ticket summaries are drawn from, most frequent first
+VOCABULARY = (
+    'the app shift worker facility payment clock login crash error page screen '
+    'timesheet cancel booking document license upload photo profile account bank '
+    'transfer notification reset password verification background check invoice '
+    'instant pay rating block late attendance location gps map frozen blank slow '
+    'update version android iphone support refund bonus overtime break signature'
+).split()
+
+
+def make_app(db_path=None, **overrides):
+    """Create an application bound to a temporary SQLite database and create its tables."""
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(suffix='.db', prefix='bench-')
+        os.close(fd)
+        os.remove(db_path)
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+        WTF_CSRF_ENABLED = False
+
+    for key, value in overrides.items():
+        setattr(BenchConfig, key, value)
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        search.create_index()
+    return app
+
+
+def seed(n_tickets, annotated_ratio=0.5, chunk_size=10000, rng=None):
+    """
+    Insert ``n_tickets`` synthetic tickets with categories and annotations.
+
+    Must be called inside an application context. Returns the benchmark user.
+    """
+    rng = rng or random.Random(42)
+    user = User(email='bench@example.com', name='Bench')
+    db.session.add(user)
+    categories = [Category(name=name) for name in CATEGORIES]
+    db.session.add_all(categories)
+    db.session.commit()
+    category_ids = [category.id for category in categories]
+
+    start = datetime(2025, 4, 1)
+    next_id = 1
+    while next_id <= n_tickets:
+        last_id = min(next_id + chunk_size, n_tickets + 1)
+        tickets, links, annotations = [], [], []
+        for ticket_pk in range(next_id, last_id):
+            tickets.append({
+                'id': ticket_pk,
+                'ticket_id': str(1000000 + ticket_pk),
+                'subject': 'Synthetic ticket %d' % ticket_pk,
+                'summary': ' '.join(rng.choice(VOCABULARY[:rng.randint(5, len(VOCABULARY))])
+                                    for _ in range(12)),
+                'conversation': '\n'.join('%s: %s' % (speaker, ' '.join(rng.choices(VOCABULARY, k=12)))
+                                          for speaker in ('Worker', 'Agent') * 4),
+                'tech_issue_likelihood': 'possible',
+                'issue_description': 'Issue description %d' % ticket_pk,
+                'created_at_zendesk': start + timedelta(days=rng.randrange(30))
+            })
+            for category_id in rng.sample(category_ids, rng.choice((1, 1, 2))):
+                links.append({'ticket_id': ticket_pk, 'category_id': category_id})
+            if rng.random() < annotated_ratio:
+                created = datetime(2025, 5, 1)
+                for i in range(rng.choice((1, 1, 2))):
+                    annotations.append({
+                        'ticket_id': ticket_pk,
+                        'user_id': user.id,
+                        'is_app_issue': rng.random() < 0.3,
+                        'rationale': '',
+                        'created_at': created + timedelta(minutes=i)
+                    })
+        db.session.execute(insert(Ticket), tickets)
+        db.session.execute(insert(ticket_category), links)
+        if annotations:
+            db.session.execute(insert(Annotation), annotations)
+        db.session.commit()
+        next_id = last_id
+    labels.repair_label_state()
+    rollup.rebuild()
+    search.rebuild()
+    return user
+
+
+def login(client, user_id):
+    """Log ``client`` in as the user ``user_id`` without going through Google OAuth."""
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+@contextmanager
+def count_queries(engine):
+    """Count the SQL statements executed on ``engine`` inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def timed(func, repeat=5):
+    """Run ``func`` ``repeat`` times and return (last result, best seconds)."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def percentile(values, pct):
+    """Return the ``pct`` percentile of ``values`` by nearest rank."""
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
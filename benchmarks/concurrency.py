@@ -0,0 +1,121 @@
+"""
+Load test concurrent annotation writes against dashboard reads.
+
+Starts writer processes that submit annotations through ``/api/annotate``,
+pausing ``--think`` seconds between submissions, and reader processes that
+render ``/dashboard``, all sharing one SQLite file like gunicorn workers
+do. Each engine profile runs on its own copy of the seeded database and the
+script reports p50/p99 latency, throughput and "database is locked" errors
+per endpoint. Run from the project root:
+
+    python -m benchmarks.concurrency --writers 4 --readers 2 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+import warnings
+from sqlalchemy.exc import OperationalError
+from app import db
+from benchmarks.common import make_app, seed, percentile
+
+PROFILES = ('default', 'production')
+
+
+def client_loop(db_path, profile, role, user_id, n_tickets, seconds, think, seed_value, start_at):
+    """Issue requests for ``seconds`` and return (latencies, errors)."""
+    warnings.simplefilter('ignore', FutureWarning)
+    app = make_app(db_path, SQLITE_PROFILE=profile, PROPAGATE_EXCEPTIONS=True)
+    rng = random.Random(seed_value)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    latencies, errors = [], 0
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            if role == 'writer':
+                response = client.post('/api/annotate', json={
+                    'ticket_id': rng.randint(1, n_tickets),
+                    'is_app_issue': rng.random() < 0.3,
+                    'rationale': 'load test'
+                })
+            else:
+                response = client.get('/dashboard')
+            ok = response.status_code == 200
+        except OperationalError:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+        if role == 'writer':
+            time.sleep(think)
+    return latencies, errors
+
+
+def run_profile(template, profile, args):
+    """Run the load test for one engine profile and print its results."""
+    workdir = tempfile.mkdtemp(prefix='bench-concurrency-')
+    db_path = os.path.join(workdir, 'app.db')
+    shutil.copy(template, db_path)
+    # Create the schema and apply the profile's journal mode before the clients start
+    make_app(db_path, SQLITE_PROFILE=profile)
+
+    roles = ['writer'] * args.writers + ['reader'] * args.readers
+    start_at = time.time() + 3.0
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(len(roles)) as pool:
+        results = pool.starmap(client_loop, [
+            (db_path, profile, role, 1, args.tickets, args.seconds, args.think, i, start_at)
+            for i, role in enumerate(roles)
+        ])
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    print('profile=%s' % profile)
+    for role, endpoint in (('writer', 'POST /api/annotate'), ('reader', 'GET /dashboard')):
+        latencies, errors = [], 0
+        for (role_latencies, role_errors), client_role in zip(results, roles):
+            if client_role == role:
+                latencies.extend(role_latencies)
+                errors += role_errors
+        print('  %-19s requests=%-6d %6.1f req/s  p50=%7.1f ms  p99=%7.1f ms  errors=%d' % (
+            endpoint, len(latencies), len(latencies) / args.seconds,
+            percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=20000)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--think', type=float, default=0.05,
+                        help='Seconds each writer waits between submissions')
+    parser.add_argument('--profile', choices=PROFILES, action='append',
+                        help='Engine profile to test (default: both)')
+    args = parser.parse_args()
+
+    fd, template = tempfile.mkstemp(suffix='.db', prefix='bench-')
+    os.close(fd)
+    os.remove(template)
+    app = make_app(template, SQLITE_PROFILE='default')
+    with app.app_context():
+        print('Seeding %d tickets...' % args.tickets)
+        seed(args.tickets)
+        db.engine.dispose()
+
+    for profile in args.profile or PROFILES:
+        run_profile(template, profile, args)
+    os.remove(template)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark the dashboard page with and without its result cache.
+
+Times a cold ``/dashboard`` request, repeat requests served from the cache
+and the first request after an annotation invalidates it. Run from the
+project root:
+
+    python -m benchmarks.dashboard_cache --tickets 100000
+"""
+import argparse
+import time
+import warnings
+from app import cache
+from benchmarks.common import make_app, seed, login, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', FutureWarning)
+
+    app = make_app()
+    with app.app_context():
+        print('Seeding %d tickets...' % args.tickets)
+        user_id = seed(args.tickets).id
+    client = app.test_client()
+    login(client, user_id)
+
+    start = time.perf_counter()
+    client.get('/dashboard')
+    print('%-28s %8.1f ms' % ('cold request', (time.perf_counter() - start) * 1000))
+
+    _, seconds = timed(lambda: client.get('/dashboard'), args.repeat)
+    print('%-28s %8.1f ms' % ('cached request (best)', seconds * 1000))
+
+    client.post('/api/annotate', json={'ticket_id': 1, 'is_app_issue': True})
+    start = time.perf_counter()
+    client.get('/dashboard')
+    print('%-28s %8.1f ms' % ('after annotation', (time.perf_counter() - start) * 1000))
+
+    with app.app_context():
+        print('cache: %s' % cache.dashboard_cache().stats())
+
+
+if __name__ == '__main__':
+    main()
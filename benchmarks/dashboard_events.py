@@ -0,0 +1,65 @@
+"""
+Benchmark live dashboard updates against reloading the dashboard.
+
+Compares what a supervisor watching progress costs the server: reloading
+``/dashboard`` after an annotation, which recomputes the summary, with one
+check of the label event stream, idle or with one new event. Run from the
+project root:
+
+    python -m benchmarks.dashboard_events --tickets 100000
+"""
+import argparse
+import statistics
+import time
+import warnings
+from app import db, events
+from app.models import Ticket
+from benchmarks.common import make_app, seed, login, count_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', FutureWarning)
+
+    app = make_app()
+    with app.app_context():
+        print('Seeding %d tickets...' % args.tickets)
+        user_id = seed(args.tickets).id
+        ticket_ids = [ticket_id for ticket_id, in db.session.query(Ticket.id).limit(args.repeat)]
+    client = app.test_client()
+    login(client, user_id)
+
+    def annotate(i):
+        client.post('/api/annotate', json={'ticket_id': ticket_ids[i], 'is_app_issue': i % 2 == 0})
+
+    def reload_dashboard():
+        return len(client.get('/dashboard').data)
+
+    def check_events(after):
+        # One check of the stream: the deadline has passed once it has run
+        return sum(len(chunk) for chunk in events.stream(after, poll_seconds=0.001, max_seconds=1e-9))
+
+    with app.app_context():
+        for name, changes, request in [('dashboard reload', 1, lambda after: reload_dashboard()),
+                                       ('event check, idle', 0, check_events),
+                                       ('event check, 1 event', 1, check_events)]:
+            latencies, queries = [], []
+            for i in range(args.repeat):
+                if changes:
+                    annotate(i)
+                after = events.last_id() - changes
+                db.session.rollback()
+                with count_queries(db.engine) as statements:
+                    start = time.perf_counter()
+                    size = request(after)
+                    latencies.append(time.perf_counter() - start)
+                queries.append(len(statements))
+            print('%-24s %8.2f ms  %3d queries  %7d bytes' % (
+                name, statistics.median(latencies) * 1000, statistics.median(queries), size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark the dashboard summary table and daily series.
+
+Compares the former per-category COUNT queries with the single grouped
+query in ``app.stats``, and times the daily series read from the
+``daily_category_stats`` rollup into a pandas DataFrame, as the dashboard
+used to chart it. Run from the project root:
+
+    python -m benchmarks.dashboard_summary --tickets 100000
+"""
+import argparse
+from datetime import datetime
+import pandas as pd
+from app import db, stats
+from app.models import Ticket, Category, Annotation
+from benchmarks.common import make_app, seed, count_queries, timed
+
+
+def legacy_summary(categories):
+    """The per-category queries previously issued by ``main.routes.dashboard``."""
+    summary_data = []
+    for category in categories:
+        category_tickets = Ticket.query.filter(Ticket.categories.contains(category))
+        unlabeled_count = category_tickets.filter(~Ticket.annotations.any()).count()
+        positive_count = db.session.query(Ticket).join(Annotation, Annotation.ticket_id == Ticket.id).filter(
+            Ticket.categories.contains(category),
+            Annotation.is_app_issue == True
+        ).group_by(Ticket.id).count()
+        negative_count = db.session.query(Ticket).join(Annotation, Annotation.ticket_id == Ticket.id).filter(
+            Ticket.categories.contains(category),
+            Annotation.is_app_issue == False
+        ).group_by(Ticket.id).count()
+        summary_data.append({
+            'category': category.name,
+            'category_id': category.id,
+            'unlabeled': unlabeled_count,
+            'positive': positive_count,
+            'negative': negative_count,
+            'total': unlabeled_count + positive_count + negative_count
+        })
+    return summary_data
+
+
+def daily_series(start_date=None, end_date=None, category_id='all'):
+    """Return ``stats.daily_rows`` as a DataFrame with one column per label and a ``count`` column."""
+    return pd.DataFrame(stats.daily_rows(start_date, end_date, category_id),
+                        columns=['date', 'category', *stats.LABELS, 'count'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--with-legacy', action='store_true',
+                        help='also time the legacy queries (quadratic without indexes)')
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        print('Seeding %d tickets...' % args.tickets)
+        seed(args.tickets)
+        categories = Category.query.all()
+        start, end = datetime(2025, 4, 1), datetime(2025, 4, 30)
+
+        runs = [('grouped summary query', lambda: stats.summary_table(categories, start, end)),
+                ('daily series from rollup', lambda: daily_series(start, end))]
+        if args.with_legacy:
+            runs.insert(0, ('legacy per-category counts', lambda: legacy_summary(categories)))
+        for name, func in runs:
+            with count_queries(db.engine) as statements:
+                func()
+            _, seconds = timed(func, args.repeat)
+            print('%-28s queries=%-4d best=%.1f ms' % (name, len(statements), seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark near-duplicate clustering.
+
+Seeds databases of increasing size whose ticket text is random except for
+families of near-duplicates, copies of one text with a word or two
+replaced. Builds the duplicate index from scratch, reporting the indexing
+rate and peak Python memory, which should stay flat as the number of
+tickets grows, how many family members ended up clustered with their
+family (recall) and how many clustered tickets share a cluster with
+another family or a random ticket. Run from the project root:
+
+    python -m benchmarks.duplicates --tickets 20000,100000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+import warnings
+from collections import Counter, defaultdict
+from sqlalchemy import select, update
+from app import db, duplicates
+from app.models import Ticket, TicketCluster
+from benchmarks.common import make_app, seed
+from benchmarks.synthetic import words
+
+
+def near_copy(rng, text, changes):
+    """Return ``text`` with ``changes`` of its words replaced."""
+    tokens = text.split()
+    for _ in range(changes):
+        tokens[rng.randrange(len(tokens))] = words(rng, 1)
+    return ' '.join(tokens)
+
+
+def write_texts(n_tickets, duplicate_ratio, rng, chunk_size=10000):
+    """Give every ticket new text and return the family of each near-duplicate ticket."""
+    families, templates = {}, []
+    for start in range(1, n_tickets + 1, chunk_size):
+        rows = []
+        for ticket_id in range(start, min(start + chunk_size, n_tickets + 1)):
+            if templates and rng.random() < duplicate_ratio:
+                family = rng.randrange(len(templates))
+                summary, description = templates[family]
+                families[ticket_id] = family
+                rows.append({'id': ticket_id, 'summary': near_copy(rng, summary, rng.randint(0, 2)),
+                             'issue_description': near_copy(rng, description, rng.randint(0, 1))})
+                continue
+            row = {'id': ticket_id, 'summary': words(rng, rng.randint(12, 30)),
+                   'issue_description': words(rng, rng.randint(8, 20))}
+            # Some random tickets start a family of their own
+            if rng.random() < duplicate_ratio / 5:
+                families[ticket_id] = len(templates)
+                templates.append((row['summary'], row['issue_description']))
+            rows.append(row)
+        db.session.execute(update(Ticket), rows)
+        db.session.commit()
+    return families
+
+
+def quality(families):
+    """Return the recall of family members and the number of clustered tickets in mixed clusters."""
+    clusters = defaultdict(list)
+    for ticket_id, cluster_id in db.session.execute(select(TicketCluster.ticket_id, TicketCluster.cluster_id)):
+        clusters[cluster_id].append(ticket_id)
+
+    # A family is recalled by the cluster holding most of its members
+    cluster_of = dict((ticket_id, cluster_id) for cluster_id, members in clusters.items() for ticket_id in members)
+    by_family = defaultdict(list)
+    for ticket_id, family in families.items():
+        by_family[family].append(cluster_of.get(ticket_id))
+    recalled = sum(max(Counter(cluster for cluster in members if cluster is not None).values(), default=0)
+                   for members in by_family.values() if len(members) > 1)
+    expected = sum(len(members) for members in by_family.values() if len(members) > 1)
+
+    mixed = sum(len(members) for members in clusters.values()
+                if len({families.get(ticket_id, -ticket_id) for ticket_id in members}) > 1)
+    return recalled / float(expected or 1), mixed, len(clusters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', default='20000,100000', help='Comma-separated database sizes')
+    parser.add_argument('--duplicates', type=float, default=0.3, help='Fraction of near-duplicate tickets')
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', FutureWarning)
+
+    for tickets in map(int, args.tickets.split(',')):
+        app = make_app()
+        with app.app_context():
+            seed(tickets, annotated_ratio=0)
+            families = write_texts(tickets, args.duplicates, random.Random(tickets))
+
+            start = time.perf_counter()
+            duplicates.rebuild(args.chunk_size)
+            seconds = time.perf_counter() - start
+            # Measured separately, as tracing allocations slows indexing down
+            tracemalloc.start()
+            duplicates.rebuild(args.chunk_size)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            recall, mixed, clusters = quality(families)
+            clustered = db.session.execute(select(TicketCluster.ticket_id).limit(1)).scalar()
+            start = time.perf_counter()
+            duplicates.near_duplicates(clustered)
+            lookup = time.perf_counter() - start
+            print('%7d tickets  %7.0f tickets/s  peak=%5.1f MiB  clusters=%6d  recall=%5.1f%%  '
+                  'mixed=%5d  lookup=%5.1f ms' % (tickets, tickets / seconds, peak / 2.0 ** 20, clusters,
+                                                  recall * 100, mixed, lookup * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+End-to-end benchmark of the main user flows.
+
+For each database size, writes a synthetic ticket file, imports it with an
+import job, adds annotation history and then drives the dashboard,
+annotation page, queue navigation and annotation submission, all through
+the Flask test client, logged in without Google OAuth. The import job is
+submitted to ``/api/jobs`` with ``JOB_WORKERS = 0``, so it runs inside the
+request and its SQL statements and allocations are measured like every
+other flow's. Reports latency, SQL statements per request and peak memory
+(traced with tracemalloc on an extra run, for the import into a scratch
+database) for each flow, saves the results as JSON and compares them with
+the previous run. Run from the project root:
+
+    python -m benchmarks.end_to_end --sizes 10000,100000
+    python -m benchmarks.end_to_end --sizes 1000000 --repeat 10
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+from sqlalchemy import func, select
+from app import db
+from app.models import User, Ticket
+from benchmarks import synthetic
+from benchmarks.common import make_app, login, count_queries, percentile
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def import_flow(db_path, path, chunk_size):
+    """
+    Return an app for a new database at ``db_path`` and a request importing ``path`` into it.
+
+    The request submits an import job to ``/api/jobs``, which runs it to
+    completion, and checks its outcome at ``/api/jobs/<id>``; the job's
+    final state is kept in the request's ``jobs`` list.
+    """
+    app = make_app(db_path, TICKETS_JSON_FILE=path, IMPORT_CHUNK_SIZE=chunk_size, JOB_WORKERS=0)
+    with app.app_context():
+        user = User(email='importer@example.com', name='Importer')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    login(client, user_id)
+
+    def request(i):
+        response = client.post('/api/jobs', json={'kind': 'import_tickets'})
+        if response.status_code >= 400:
+            return response
+        job = client.get('/api/jobs/%d' % response.json['job']['id']).json['job']
+        if job['status'] != 'complete':
+            raise RuntimeError('Import job %s: %s' % (job['status'], job['error']))
+        request.jobs.append(job)
+        return response
+    request.jobs = []
+    return app, request
+
+
+def measure(request, repeat, traced=None):
+    """
+    Call ``request(i)`` ``repeat`` times and return its latency and query metrics.
+
+    Peak memory is measured on one extra call, of ``traced`` if given, as
+    tracing allocations slows requests down.
+    """
+    latencies, queries = [], []
+    for i in range(repeat):
+        with count_queries(db.engine) as statements:
+            start = time.perf_counter()
+            response = request(i)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError('Request failed with status %d' % response.status_code)
+        queries.append(len(statements))
+    tracemalloc.start()
+    (traced or request)(repeat)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'max_ms': max(latencies) * 1000,
+        'queries': percentile(queries, 50),
+        'peak_mib': peak / 2.0 ** 20,
+    }
+
+
+def run_size(n_tickets, args):
+    """Build a database of ``n_tickets`` synthetic tickets and measure every flow against it."""
+    workdir = tempfile.mkdtemp(prefix='bench-e2e-')
+    try:
+        path = os.path.join(workdir, 'tickets.jsonl.gz')
+        db_path = os.path.join(workdir, 'app.db')
+        start = time.perf_counter()
+        synthetic.write_file(path, n_tickets, rng=random.Random(args.seed))
+        print('  generated %d tickets in %.1fs' % (n_tickets, time.perf_counter() - start))
+
+        # An import only runs once per database, so its memory is traced
+        # importing the same file into a scratch database
+        results = {}
+        app, import_request = import_flow(db_path, path, args.chunk_size)
+        _, traced_request = import_flow(os.path.join(workdir, 'scratch.db'), path, args.chunk_size)
+        with app.app_context():
+            results['import'] = measure(import_request, 1, traced_request)
+        results['import']['rows_per_sec'] = import_request.jobs[0]['rows_per_sec']
+
+        with app.app_context():
+            synthetic.add_annotations(ratio=args.annotated, rng=random.Random(args.seed))
+            user_id = User.query.filter_by(email='annotator0@example.com').first().id
+            ticket_count = db.session.execute(select(func.max(Ticket.id))).scalar()
+        client = app.test_client()
+        login(client, user_id)
+        rng = random.Random(args.seed)
+        cache = app.extensions['dashboard_cache']
+
+        # The whole range of the synthetic tickets
+        dashboard = '/dashboard?start_date=2025-03-01&end_date=2025-05-31&category_id=all'
+        series = '/api/dashboard/series?start_date=2025-03-01&end_date=2025-05-31&category_id=all'
+
+        def uncached(url):
+            def request(i):
+                cache.clear()
+                return client.get(url)
+            return request
+
+        flows = [
+            ('dashboard (cold)', uncached(dashboard)),
+            ('dashboard (cached)', lambda i: client.get(dashboard)),
+            ('dashboard series', uncached(series)),
+            ('annotate', lambda i: client.get('/annotate?category_id=all&status=unlabeled')),
+            ('next_ticket', lambda i: client.get(
+                '/api/next_ticket?current_ticket_id=%d&category_id=%d&status=unlabeled'
+                % (rng.randint(1, ticket_count), i % 10 + 1))),
+            ('submit_annotation', lambda i: client.post('/api/annotate', json={
+                'ticket_id': rng.randint(1, ticket_count), 'is_app_issue': rng.random() < 0.3,
+                'rationale': 'benchmark'})),
+        ]
+        with app.app_context():
+            for name, request in flows:
+                results[name] = measure(request, args.repeat)
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def previous_results(path=None):
+    """Return the saved results at ``path``, or of the latest saved run, or None."""
+    if path is None:
+        saved = sorted(glob.glob(os.path.join(RESULTS_DIR, '*.json')))
+        path = saved[-1] if saved else None
+    if path is None:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(current, previous):
+    """Format the relative change from ``previous`` to ``current``."""
+    if not previous:
+        return ' ' * 7
+    return '%+6.0f%%' % (100.0 * (current - previous) / previous)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='10000,100000', help='Comma-separated ticket counts')
+    parser.add_argument('--repeat', type=int, default=20, help='Requests per flow')
+    parser.add_argument('--annotated', type=float, default=0.5, help='Fraction of tickets with annotations')
+    parser.add_argument('--chunk-size', type=int, default=2000, help='Import chunk size')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--compare', help='Results file to compare with (default: the latest saved run)')
+    parser.add_argument('--no-save', action='store_true', help="Don't save this run's results")
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    baseline = previous_results(args.compare)
+    if baseline:
+        print('Comparing with the run of %s' % baseline['created'])
+    run = {
+        'created': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'sizes': {},
+    }
+    for n_tickets in map(int, args.sizes.split(',')):
+        print('%d tickets' % n_tickets)
+        results = run_size(n_tickets, args)
+        run['sizes'][str(n_tickets)] = results
+        before = (baseline or {}).get('sizes', {}).get(str(n_tickets), {})
+        for name, metrics in results.items():
+            old = before.get(name, {})
+            print('  %-20s p50=%9.1f ms %s  max=%9.1f ms  queries=%6d %s  peak=%7.1f MiB' % (
+                name, metrics['p50_ms'], change(metrics['p50_ms'], old.get('p50_ms')), metrics['max_ms'],
+                metrics['queries'], change(metrics['queries'], old.get('queries')), metrics['peak_mib']))
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, run['created'].replace(':', '') + '.json')
+        with open(path, 'w') as f:
+            json.dump(run, f, indent=2)
+        print('Saved results to %s' % os.path.relpath(path))
+
+
+if __name__ == '__main__':
+    main()
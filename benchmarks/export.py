@@ -0,0 +1,55 @@
+"""
+Benchmark streaming annotation exports.
+
+Seeds databases of increasing size and streams every export format
+through ``/api/export``, reporting the export rate and the peak Python
+memory allocated while streaming, which should stay flat as the number of
+rows grows. Run from the project root:
+
+    python -m benchmarks.export --tickets 20000,100000
+"""
+import argparse
+import time
+import tracemalloc
+from app import exporter
+from benchmarks.common import make_app, seed, login
+
+
+def download(client, url):
+    """Stream ``url`` and return the number of bytes received."""
+    response = client.get(url, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', default='20000,100000', help='Comma-separated database sizes')
+    args = parser.parse_args()
+
+    for tickets in map(int, args.tickets.split(',')):
+        app = make_app()
+        with app.app_context():
+            user_id = seed(tickets, annotated_ratio=0.8).id
+        client = app.test_client()
+        login(client, user_id)
+
+        for fmt in sorted(exporter.FORMATS):
+            for history in (0, 1):
+                url = '/api/export?format=%s&history=%d' % (fmt, history)
+                start = time.perf_counter()
+                size = download(client, url)
+                seconds = time.perf_counter() - start
+                # Measured separately, as tracing allocations slows the export down
+                tracemalloc.start()
+                download(client, url)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print('%7d tickets  %-7s %-7s %7.1f MiB in %5.2fs  peak=%5.1f MiB' % (
+                    tickets, fmt, 'history' if history else 'latest', size / 2.0 ** 20, seconds,
+                    peak / 2.0 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Simulate concurrent annotators claiming tickets through leases.
+
+Runs annotator threads against a seeded database. Each repeatedly leases a
+block of unlabeled tickets, annotates them and claims the next block. The
+script reports claim and annotation throughput for each thread count and
+exits non-zero if any ticket was leased to two annotators. Run from the
+project root:
+
+    python -m benchmarks.leases --tickets 20000 --threads 1,2,4,8
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from app import db, labels, leases
+from app.models import User
+from benchmarks.common import make_app, seed
+
+
+def annotator(app, user_id, block, deadline, claims, latencies):
+    """Claim and annotate blocks of tickets as ``user_id`` until ``deadline`` or the queue is empty."""
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            ticket_ids = leases.claim(user, block)
+            db.session.commit()
+            latencies.append(time.perf_counter() - start)
+            if not ticket_ids:
+                break
+            claims.extend((ticket_id, user_id) for ticket_id in ticket_ids)
+            labels.record_annotations(user, [{'ticket_id': ticket_id, 'is_app_issue': ticket_id % 3 == 0}
+                                             for ticket_id in ticket_ids])
+            db.session.commit()
+
+
+def simulate(threads, args):
+    """Run ``threads`` annotators on a fresh database; return (claims, latencies, seconds)."""
+    app = make_app()
+    with app.app_context():
+        seed(args.tickets, annotated_ratio=0)
+        users = [User(email='annotator%d@example.com' % index, name='Annotator %d' % index)
+                 for index in range(threads)]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [user.id for user in users]
+
+    claims, latencies = [], []
+    start = time.perf_counter()
+    workers = [threading.Thread(target=annotator,
+                                args=(app, user_id, args.block, start + args.seconds, claims, latencies))
+               for user_id in user_ids]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return claims, latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=20000)
+    parser.add_argument('--threads', default='1,2,4,8', help='Comma-separated annotator thread counts')
+    parser.add_argument('--block', type=int, default=20, help='Tickets leased per claim')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Run time per thread count')
+    args = parser.parse_args()
+
+    double_assigned = 0
+    for threads in map(int, args.threads.split(',')):
+        claims, latencies, seconds = simulate(threads, args)
+        holders = {}
+        for ticket_id, user_id in claims:
+            holders.setdefault(ticket_id, set()).add(user_id)
+        doubles = sum(len(users) > 1 for users in holders.values())
+        double_assigned += doubles
+        latencies.sort()
+        per_user = Counter(user_id for _, user_id in claims)
+        print('%2d annotators: %7.0f tickets/sec claimed and annotated, claim p50=%5.1f ms p99=%6.1f ms, '
+              'per annotator %d-%d, double assigned %d' % (
+                  threads, len(claims) / seconds,
+                  latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000,
+                  min(per_user.values()), max(per_user.values()), doubles))
+
+    if double_assigned:
+        print('%d tickets were leased to more than one annotator' % double_assigned)
+        sys.exit(1)
+    print('No ticket was leased to more than one annotator')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Check that the hot queries use their indexes.
+
+Runs the queries behind the dashboard, the annotation queue, ticket leasing,
+near-duplicate indexing and the label state repair against a small seeded database, prints SQLite's
+``EXPLAIN QUERY PLAN`` for each and fails if an expected index is not used.
+Run from the project root:
+
+    python -m benchmarks.query_plans
+"""
+import argparse
+import sys
+from datetime import date
+from sqlalchemy import event, select, text
+from app import db, duplicates, leases, queue, stats
+from app.models import Annotation, User
+from app.models.models import latest_annotations
+from benchmarks.common import make_app, seed
+
+# (name, callable, index that must appear in the plan)
+CHECKS = [
+    ('queue next, all categories',
+     lambda: queue.next_id(50, 'all', 'unlabeled'), 'ix_ticket_current_label'),
+    ('queue next, one category',
+     lambda: queue.next_id(50, '3', 'unlabeled'), 'ix_ticket_category_category_id_ticket_id'),
+    ('queue prev, one category',
+     lambda: queue.prev_id(50, '3', 'unlabeled'), 'ix_ticket_category_category_id_ticket_id'),
+    ('queue position, one category',
+     lambda: queue.position(50, '3', 'unlabeled'), 'ix_ticket_category_category_id_ticket_id'),
+    ('lease claim, one category',
+     lambda: leases.claim(db.session.get(User, 1), 5, '3', 'unlabeled'),
+     'ix_ticket_category_category_id_ticket_id'),
+    ('near-duplicate candidates',
+     lambda: duplicates.bucket_members(duplicates.buckets(duplicates.signatures(['app crash on login'])[0])),
+     'PRIMARY KEY (band=? AND bucket=?)'),
+    ('dashboard summary, one category',
+     lambda: stats.summary_counts(category_id='3'), 'ix_ticket_category_category_id_ticket_id'),
+    ('dashboard summary, date range',
+     lambda: stats.summary_counts(date(2025, 4, 10), date(2025, 4, 12)),
+     'ix_ticket_created_at_zendesk'),
+    ('ticket annotation history',
+     lambda: db.session.execute(select(Annotation).where(Annotation.ticket_id == 50)
+                                .order_by(Annotation.created_at.desc())).all(),
+     'ix_annotation_ticket_id_created_at'),
+    ('latest annotation per ticket',
+     lambda: db.session.execute(select(latest_annotations())).all(),
+     'ix_annotation_ticket_id_created_at'),
+]
+
+
+def capture(func):
+    """Run ``func`` and return the (statement, parameters) pairs it executed."""
+    executed = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return executed
+
+
+def query_plan(statement, parameters):
+    """Return SQLite's query plan for ``statement`` as a list of detail strings."""
+    cursor = db.session.connection().connection.cursor()
+    try:
+        return [row[3] for row in cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)]
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=5000)
+    args = parser.parse_args()
+
+    app = make_app()
+    failures = 0
+    with app.app_context():
+        seed(args.tickets)
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+        for name, func, index in CHECKS:
+            plans = [query_plan(statement, parameters) for statement, parameters in capture(func)]
+            used = any(index in detail for plan in plans for detail in plan)
+            failures += not used
+            print('%s %s (expects %s)' % ('ok  ' if used else 'FAIL', name, index))
+            for plan in plans:
+                for detail in plan:
+                    print('       ' + detail)
+
+    if failures:
+        print('%d of %d queries do not use their index' % (failures, len(CHECKS)))
+        sys.exit(1)
+    print('All %d queries use their index' % len(CHECKS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark full-text search over ticket content.
+
+Times ranked ``app.search`` queries of varying selectivity and the
+annotation queue's search filter against a ``LIKE`` scan of the same text
+columns. Run from the project root:
+
+    python -m benchmarks.search --tickets 500000
+"""
+import argparse
+import time
+from sqlalchemy import func, or_, select
+from app import db, queue, search
+from app.models import Ticket
+from benchmarks.common import make_app, seed, timed
+
+QUERIES = ['signature', 'gps frozen', 'refund overtime', 'crash', 'verif*']
+
+
+def like_count(word):
+    """Count tickets containing ``word`` with a LIKE scan of the text columns."""
+    pattern = '%' + word + '%'
+    stmt = select(func.count()).where(or_(*[getattr(Ticket, name).like(pattern)
+                                             for name in search.COLUMNS]))
+    return db.session.execute(stmt).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        print('Seeding %d tickets...' % args.tickets)
+        start = time.perf_counter()
+        seed(args.tickets)
+        print('Seeded and indexed in %.1fs' % (time.perf_counter() - start))
+
+        for q in QUERIES:
+            matches = queue.total('all', 'all', q)
+            print('q=%-18r matches=%d' % (q, matches))
+            runs = [
+                ('search top 20', lambda: search.search(q, 20)),
+                ('search top 20 unlabeled', lambda: search.search(q, 20, queue.queue_ids('all', 'unlabeled'))),
+                ('queue next_id', lambda: queue.next_id(args.tickets // 2, 'all', 'unlabeled', q)),
+                ('queue total', lambda: queue.total('all', 'unlabeled', q)),
+            ]
+            for name, func_ in runs:
+                _, seconds = timed(func_, args.repeat)
+                print('  %-24s best=%8.2f ms' % (name, seconds * 1000))
+
+        _, seconds = timed(lambda: like_count('signature'), 1)
+        print('LIKE scan for %r          %8.2f ms' % ('signature', seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
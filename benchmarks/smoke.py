@@ -0,0 +1,63 @@
+"""
+Check that every benchmark still runs.
+
+Runs each benchmark script in a fresh process on a small database, so
+schema or API changes that break a benchmark show up without waiting for
+full-size runs; the timings printed are not meaningful. Exits with an
+error status if any benchmark fails. Run from the project root:
+
+    python -m benchmarks.smoke
+    python -m benchmarks.smoke dashboard_summary search
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmark modules and the arguments that keep them small; {directory} is a
+# temporary directory for output files
+RUNS = [
+    ('dashboard_summary', ['--tickets', '2000', '--repeat', '1', '--with-legacy']),
+    ('annotation_queue', ['--tickets', '2000', '--repeat', '1']),
+    ('annotation_batch', ['--tickets', '2000', '--annotations', '200', '--batch-sizes', '10,100']),
+    ('dashboard_cache', ['--tickets', '2000', '--repeat', '1']),
+    ('dashboard_events', ['--tickets', '2000', '--repeat', '1']),
+    ('query_plans', ['--tickets', '2000']),
+    ('search', ['--tickets', '2000', '--repeat', '1']),
+    ('text_storage', ['--tickets', '2000', '--list', '100', '--repeat', '1']),
+    ('export', ['--tickets', '2000']),
+    ('duplicates', ['--tickets', '2000']),
+    ('analytics', ['--annotations', '5000', '--users', '5']),
+    ('leases', ['--tickets', '2000', '--threads', '1,2', '--seconds', '0.5']),
+    ('concurrency', ['--tickets', '2000', '--writers', '1', '--readers', '1', '--seconds', '1']),
+    ('startup', ['--runs', '1']),
+    ('end_to_end', ['--sizes', '2000', '--repeat', '2', '--no-save']),
+    ('synthetic', ['{directory}/tickets.jsonl.gz', '--tickets', '200']),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('benchmarks', nargs='*', help='Benchmarks to run (default: all)')
+    args = parser.parse_args()
+
+    runs = [(name, argv) for name, argv in RUNS if not args.benchmarks or name in args.benchmarks]
+    failed = []
+    with tempfile.TemporaryDirectory(prefix='bench-smoke-') as directory:
+        for name, argv in runs:
+            start = time.perf_counter()
+            argv = [arg.format(directory=directory) for arg in argv]
+            result = subprocess.run([sys.executable, '-m', 'benchmarks.' + name, *argv],
+                                    capture_output=True, text=True)
+            print('%-20s %s  %5.1fs' % (name, 'ok    ' if result.returncode == 0 else 'FAILED',
+                                        time.perf_counter() - start))
+            if result.returncode != 0:
+                failed.append(name)
+                print(result.stderr.strip()[-2000:], file=sys.stderr)
+    if failed:
+        sys.exit('Failed: %s' % ', '.join(failed))
+
+
+if __name__ == '__main__':
+    main()
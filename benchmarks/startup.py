@@ -0,0 +1,70 @@
+"""
+Benchmark web worker startup.
+
+Starts fresh Python processes that import ``wsgi`` the way a gunicorn
+worker does and reports the import time and resident memory of each,
+alongside a run that also imports pandas and plotly.express, the modules
+``app.main.routes`` used to import eagerly, if they are installed; they are
+no longer in requirements.txt. Run from the project root:
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = '''
+import json, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+with open('/proc/self/status') as f:
+    rss = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+print(json.dumps({{'seconds': elapsed, 'rss_kib': rss}}))
+'''
+
+VARIANTS = [
+    ('wsgi', ['wsgi']),
+    ('wsgi + pandas, plotly.express', ['wsgi', 'pandas', 'plotly.express']),
+]
+
+
+def probe(modules, env):
+    """Import ``modules`` in a new interpreter and return its timing and memory."""
+    output = subprocess.run([sys.executable, '-c', PROBE.format(modules=modules)],
+                            env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    fd, db_path = tempfile.mkstemp(suffix='.db', prefix='bench-')
+    os.close(fd)
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path,
+               PYTHONPATH=os.getcwd())
+    try:
+        for name, modules in VARIANTS:
+            missing = [module for module in modules[1:]
+                       if importlib.util.find_spec(module.split('.')[0]) is None]
+            if missing:
+                print('%-32s skipped, %s not installed' % (name, ', '.join(missing)))
+                continue
+            results = [probe(modules, env) for _ in range(args.runs)]
+            seconds = statistics.median(result['seconds'] for result in results)
+            rss = statistics.median(result['rss_kib'] for result in results)
+            print('%-32s import=%7.1f ms  rss=%6.1f MiB' % (name, seconds * 1000, rss / 1024.0))
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
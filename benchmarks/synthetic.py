@@ -0,0 +1,157 @@
+"""
+Synthetic ticket data for benchmarks and local testing.
+
+Writes gzipped JSON Lines files in the format of the Zendesk export that
+``flask import-tickets`` and "Load Sample Data" read, and adds annotation
+history for the imported tickets. Ticket count, category mix,
+conversation length and the date range are configurable, so production-
+sized databases can be reproduced locally. Run from the project root:
+
+    python -m benchmarks.synthetic data/synthetic.jsonl.gz --tickets 100000 \\
+        --categories 'payment=4,timesheet submission=3,account=2' --turns 8
+"""
+import argparse
+import gzip
+import json
+import random
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert, select
+from app import db, labels
+from app.importer import CATEGORIES
+from app.models import User, Ticket, Annotation
+from benchmarks.common import VOCABULARY
+
+SUBJECTS = [
+    "Can't clock in to my {word} shift", 'App shows a blank {word} page', '{word} not working',
+    'Question about my {word}', 'Problem with {word} after update', 'Need help with {word}',
+]
+
+# Word frequencies fall off geometrically along the vocabulary
+WORD_WEIGHTS = [0.92 ** rank for rank in range(len(VOCABULARY))]
+WORD_CUM_WEIGHTS = [sum(WORD_WEIGHTS[:rank + 1]) for rank in range(len(VOCABULARY))]
+
+RATIONALES = ['', '', '', 'Crash reported in the chat', 'Account question, not an app issue',
+              'Reproducible on the latest version', 'User error']
+
+
+def parse_weights(text):
+    """Parse ``'name=weight,...'`` into a category weight mapping; unnamed categories get weight 1."""
+    weights = dict.fromkeys(CATEGORIES, 1.0)
+    for item in filter(None, (text or '').split(',')):
+        name, _, weight = item.partition('=')
+        if name.strip() not in weights:
+            raise ValueError('Unknown category: %s' % name.strip())
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def words(rng, count):
+    """Return ``count`` words drawn from the vocabulary, favouring its first words."""
+    return ' '.join(rng.choices(VOCABULARY, cum_weights=WORD_CUM_WEIGHTS, k=count))
+
+
+def generate_records(n_tickets, category_weights=None, turns=8, days=90, start=date(2025, 3, 1),
+                     first_id=1, rng=None):
+    """
+    Yield ``n_tickets`` synthetic export records.
+
+    Each ticket has one to three categories drawn from ``category_weights``
+    and a conversation of about ``turns`` messages (exponentially
+    distributed, so a few are much longer), created on one of ``days`` days
+    from ``start``.
+    """
+    rng = rng or random.Random(42)
+    weights = category_weights or parse_weights(None)
+    names, cumulative = list(weights), []
+    for weight in weights.values():
+        cumulative.append((cumulative[-1] if cumulative else 0) + weight)
+
+    for ticket_id in range(first_id, first_id + n_tickets):
+        categories = set(rng.choices(names, cum_weights=cumulative, k=rng.choice((1, 1, 1, 2, 3))))
+        messages = max(1, int(rng.expovariate(1.0 / turns)))
+        likelihood = rng.choice((1, 2, 3, 4, 4))
+        yield {
+            'TICKET_ID': 1000000 + ticket_id,
+            'SUBJECT': rng.choice(SUBJECTS).format(word=words(rng, 1)),
+            'SUMMARY': words(rng, rng.randint(8, 30)),
+            'CHAT_HISTORY': '\n'.join('%s: %s' % ('Worker' if turn % 2 == 0 else 'Agent',
+                                                  words(rng, rng.randint(4, 30)))
+                                      for turn in range(messages)),
+            'ISSUE_DESCRIPTION': words(rng, rng.randint(5, 20)),
+            'IN_APP_ISSUE_LIKELIHOOD': likelihood,
+            'NOT_AN_ISSUE': rng.random() < 0.15,
+            'CREATED_AT_PST': (start + timedelta(days=rng.randrange(days))).isoformat(),
+            'REQUEST_CATEGORIES': sorted(categories),
+        }
+
+
+def write_file(path, n_tickets, **options):
+    """Write ``n_tickets`` records to the gzipped JSON Lines file ``path``; see ``generate_records``."""
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        for record in generate_records(n_tickets, **options):
+            f.write(json.dumps(record) + '\n')
+    return n_tickets
+
+
+def add_annotations(ratio=0.5, annotators=5, max_history=3, chunk_size=10000, rng=None):
+    """
+    Annotate a fraction ``ratio`` of the imported tickets.
+
+    Creates ``annotators`` users and gives each chosen ticket one to
+    ``max_history`` annotations by random annotators, so tickets have
+    relabeling history. Updates the label state and rollup, commits, and
+    returns the number of annotations added. Must be called inside an
+    application context.
+    """
+    rng = rng or random.Random(7)
+    users = []
+    for index in range(annotators):
+        email = 'annotator%d@example.com' % index
+        user = User.query.filter_by(email=email).first() or User(email=email, name='Annotator %d' % index)
+        db.session.add(user)
+        users.append(user)
+    db.session.commit()
+    user_ids = [user.id for user in users]
+
+    added, last_id = 0, 0
+    stmt = select(Ticket.id).order_by(Ticket.id)
+    while True:
+        ticket_ids = db.session.execute(stmt.where(Ticket.id > last_id).limit(chunk_size)).scalars().all()
+        if not ticket_ids:
+            break
+        rows = []
+        for ticket_id in ticket_ids:
+            if rng.random() >= ratio:
+                continue
+            created = datetime(2025, 5, 1) + timedelta(minutes=rng.randrange(60 * 24 * 60))
+            for _ in range(rng.randint(1, max_history)):
+                created += timedelta(minutes=rng.randint(1, 60 * 24 * 7))
+                rows.append({'ticket_id': ticket_id, 'user_id': rng.choice(user_ids),
+                             'is_app_issue': rng.random() < 0.3, 'rationale': rng.choice(RATIONALES),
+                             'created_at': created})
+        if rows:
+            db.session.execute(insert(Annotation), rows)
+        db.session.commit()
+        added += len(rows)
+        last_id = ticket_ids[-1]
+    labels.repair_label_state()
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('path', help='Output file, e.g. data/synthetic.jsonl.gz')
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--categories', help="Category weights, e.g. 'payment=4,account=2' (others weigh 1)")
+    parser.add_argument('--turns', type=int, default=8, help='Mean number of conversation messages')
+    parser.add_argument('--days', type=int, default=90, help='Number of days the tickets are spread over')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    write_file(args.path, args.tickets, category_weights=parse_weights(args.categories),
+               turns=args.turns, days=args.days, rng=random.Random(args.seed))
+    print('Wrote %d tickets to %s' % (args.tickets, args.path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark ticket text storage.
+
+Seeds the same synthetic tickets with and without ``COMPRESS_TICKET_TEXT``
+and reports the size of the database file and of the ticket table and the
+search index in it, and times listing tickets with their large text columns
+deferred and undeferred. Run from the project
+root:
+
+    python -m benchmarks.text_storage --tickets 100000
+"""
+import argparse
+import tracemalloc
+from sqlalchemy import text
+from sqlalchemy.orm import undefer_group
+from app import db
+from app.models import Ticket
+from benchmarks.common import make_app, seed, timed
+
+
+def database_size():
+    """Return the bytes of all pages of the database, as the file has once checkpointed."""
+    page_count = db.session.execute(text('PRAGMA page_count')).scalar()
+    return page_count * db.session.execute(text('PRAGMA page_size')).scalar()
+
+
+def table_size(pattern):
+    """Return the bytes of database pages used by tables and indexes whose name is LIKE ``pattern``."""
+    return db.session.execute(text('SELECT SUM(pgsize) FROM dbstat WHERE name LIKE :pattern'),
+                              {'pattern': pattern}).scalar() or 0
+
+
+def peak_memory(func):
+    """Run ``func`` and return the peak memory it allocated, in bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--list', type=int, default=5000, help='Tickets loaded per listing')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for compress in (False, True):
+        app = make_app(COMPRESS_TICKET_TEXT=compress)
+        with app.app_context():
+            seed(args.tickets)
+            # ticket_fts is stored in several shadow tables, ticket_fts_data etc.
+            print('COMPRESS_TICKET_TEXT=%s: database %.1f MiB, ticket table %.1f MiB, search index %.1f MiB' % (
+                compress, database_size() / 2.0 ** 20, table_size('ticket') / 2.0 ** 20,
+                table_size('ticket_fts%') / 2.0 ** 20))
+
+            def listing(*options):
+                db.session.expunge_all()
+                return Ticket.query.options(*options).order_by(Ticket.id).limit(args.list).all()
+
+            runs = [('deferred text', ()), ('undeferred text', (undefer_group('text'),))]
+            for name, options in runs:
+                _, seconds = timed(lambda: listing(*options), args.repeat)
+                memory = peak_memory(lambda: listing(*options))
+                print('  list %d tickets, %-16s best=%7.1f ms  peak=%6.1f MiB' % (
+                    args.list, name, seconds * 1000, memory / 2.0 ** 20))
+
+
+if __name__ == '__main__':
+    main()
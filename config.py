@@ -14,6 +14,21 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'instance', 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # SQLite engine profile: 'production' puts connections in WAL mode with
+    # synchronous=NORMAL, a busy timeout (milliseconds), a larger page cache
+    # (negative values are KiB) and a memory map (bytes); 'default' keeps
+    # SQLite's own settings
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE') or 'production'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 15000)
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or -65536)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 268435456)
+    
+    # Database connections kept open by each web worker process; size the
+    # pool to the worker's thread count
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 5)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 5)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)
+    
     # Google OAuth Configuration
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
@@ -22,5 +37,61 @@ class Config:
     # Company domain for restricting access
     COMPANY_DOMAIN = os.environ.get('COMPANY_DOMAIN') or 'example.com'
     
+    # Number of tickets the annotation page buffers per /api/tickets request,
+    # and the maximum a single request may ask for
+    TICKET_BATCH_SIZE = int(os.environ.get('TICKET_BATCH_SIZE') or 20)
+    TICKET_BATCH_MAX = int(os.environ.get('TICKET_BATCH_MAX') or 100)
+    
+    # Maximum number of annotations accepted by one /api/annotations/batch request
+    ANNOTATION_BATCH_MAX = int(os.environ.get('ANNOTATION_BATCH_MAX') or 1000)
+    
+    # Number of input records written per bulk insert during imports
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE') or 2000)
+    
+    # Seconds an annotator keeps the unlabeled tickets they are shown before
+    # others may claim them
+    LEASE_SECONDS = int(os.environ.get('LEASE_SECONDS') or 600)
+    
+    # Number of processes running background jobs in each web worker; 0 runs
+    # jobs inside the request that submits them
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS') or 1)
+    
+    # Directory export jobs write their files to
+    EXPORT_DIR = os.environ.get('EXPORT_DIR') or os.path.join(basedir, 'instance', 'exports')
+    
+    # Store ticket summaries, conversations and issue descriptions of at least
+    # COMPRESS_MIN_LENGTH characters zlib-compressed; off by default, as the
+    # compressed values are BLOBs that other SQLite clients can't read as text
+    COMPRESS_TICKET_TEXT = os.environ.get('COMPRESS_TICKET_TEXT', 'false').lower() in ('1', 'true', 'yes')
+    COMPRESS_MIN_LENGTH = int(os.environ.get('COMPRESS_MIN_LENGTH') or 256)
+    
+    # Number of dashboard filter combinations cached per web worker
+    DASHBOARD_CACHE_SIZE = int(os.environ.get('DASHBOARD_CACHE_SIZE') or 128)
+    
+    # Live dashboard updates: seconds between checks for label changes, seconds
+    # before a stream is closed for the browser to reconnect, and hours label
+    # changes are kept for reconnecting dashboards
+    DASHBOARD_EVENTS_POLL_SECONDS = float(os.environ.get('DASHBOARD_EVENTS_POLL_SECONDS') or 1)
+    DASHBOARD_EVENTS_STREAM_SECONDS = int(os.environ.get('DASHBOARD_EVENTS_STREAM_SECONDS') or 300)
+    LABEL_EVENT_RETENTION_HOURS = int(os.environ.get('LABEL_EVENT_RETENTION_HOURS') or 24)
+    
+    # Estimated share of word pairs two tickets must have in common to be
+    # clustered as near-duplicates
+    DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD') or 0.8)
+    
+    # Record per-endpoint latency and SQL metrics, served on /metrics; set
+    # PROMETHEUS_MULTIPROC_DIR to serve the totals of all web workers
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    
+    # Bearer token scrapers must send for /metrics, which is not served without one
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Log requests taking at least this many milliseconds with their most
+    # expensive SQL statements; 0 disables the log
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS') or 0)
+    
+    # Executions of one SQL statement within a request reported as a likely N+1 query
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD') or 10)
+    
     # Input file path
     TICKETS_JSON_FILE = os.environ.get('TICKETS_JSON') or os.path.join(basedir, 'data', 'potential_tech_issues.jsonl.gz')
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""ticket search
+
+Revision ID: 0008_ticket_search
+Revises: 0007_daily_category_stats
+Create Date: 2026-10-18 04:02:13.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_ticket_search'
+down_revision = '0007_daily_category_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-specific; other databases need their own search index
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE ticket_fts USING fts5("
+        "subject, summary, conversation, issue_description, tokenize='porter unicode61')"
+    )
+    op.execute(
+        "INSERT INTO ticket_fts (rowid, subject, summary, conversation, issue_description) "
+        "SELECT id, subject, summary, conversation, issue_description FROM ticket"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE ticket_fts")
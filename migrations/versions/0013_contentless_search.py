@@ -0,0 +1,55 @@
+"""contentless search index
+
+Revision ID: 0013_contentless_search
+Revises: 0012_duplicate_clusters
+Create Date: 2026-10-18 05:52:40.118204
+
+"""
+import zlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013_contentless_search'
+down_revision = '0012_duplicate_clusters'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('subject', 'summary', 'conversation', 'issue_description')
+
+
+def _rebuild(content):
+    """Recreate ticket_fts with the given content option and index the tickets."""
+    op.execute("DROP TABLE ticket_fts")
+    op.execute(
+        "CREATE VIRTUAL TABLE ticket_fts USING fts5("
+        "subject, summary, conversation, issue_description, %stokenize='porter unicode61')" % content
+    )
+    # Compressed text is stored as zlib bytes and must be indexed decompressed
+    bind = op.get_bind()
+    select = sa.text("SELECT id, %s FROM ticket WHERE id > :last_id ORDER BY id LIMIT 10000" % ', '.join(COLUMNS))
+    insert = sa.text("INSERT INTO ticket_fts (rowid, %s) VALUES (:id, %s)"
+                     % (', '.join(COLUMNS), ', '.join(':' + name for name in COLUMNS)))
+    last_id = 0
+    while True:
+        rows = [{name: zlib.decompress(value).decode('utf-8') if isinstance(value, bytes) else value
+                 for name, value in row._mapping.items()}
+                for row in bind.execute(select, {'last_id': last_id})]
+        if not rows:
+            break
+        bind.execute(insert, rows)
+        last_id = rows[-1]['id']
+
+
+def upgrade():
+    # FTS5 is SQLite-specific; other databases need their own search index
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild("content='', ")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild('')